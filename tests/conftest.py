@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,21 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_cache(tmp_path_factory):
+    # свои кэши и рабочие файлы: тесты не трогают файлы деплоя
+    from core.test_runner import isolated_settings
+    from django.test.utils import override_settings
+
+    with override_settings(
+        **isolated_settings(str(tmp_path_factory.mktemp('deployment')))
+    ):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    # миниатюры без пула потоков: поток не переживет тест
+    settings.POSTS_THUMBNAIL_WORKERS = 0
@@ -0,0 +1,11 @@
+import os
+
+from django.conf import settings
+
+
+def isolated_caches(directory):
+    """CACHES из настроек, но у каждого кэша свой файл в directory."""
+    return {
+        alias: {**params, 'LOCATION': os.path.join(directory, alias)}
+        for alias, params in settings.CACHES.items()
+    }
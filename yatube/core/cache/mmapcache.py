@@ -0,0 +1,347 @@
+"""Кэш в общем для всех воркеров файле, отображенном в память.
+
+Файл поделен на корзины по WAYS слотов фиксированного размера.
+Ключ хэшируется в корзину, при нехватке места в корзине вытесняется
+слот, к которому дольше всех не обращались (LRU внутри корзины).
+Общий объем ограничен MAX_SIZE байт.
+
+Корзины запираются fcntl-блокировками по диапазону байт, поэтому
+процессы на одной машине видят одни и те же данные без отдельного
+демона. Внутри процесса потоки разводит обычный Lock.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+
+from core import metrics
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'YTMC'
+LAYOUT_VERSION = 1
+# magic, версия, размер слота, число корзин, слотов в корзине
+_HEADER = struct.Struct('<4sIIII')
+HEADER_SIZE = 64
+# хэш ключа (0 — пустой слот), срок жизни, последнее обращение,
+# длина ключа, длина значения
+_SLOT = struct.Struct('<QddHI')
+
+_locks = {}
+# (путь, заголовок разметки) -> (pid, дескриптор, mmap) этого процесса
+_files = {}
+
+
+class MmapCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location or os.path.join(
+            tempfile.gettempdir(), 'django-mmap-cache'
+        )
+        self._slot_size = int(options.get('SLOT_SIZE', 16 * 1024))
+        self._ways = int(options.get('WAYS', 8))
+        max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._buckets = max(1, max_size // (self._slot_size * self._ways))
+        self._size = (
+            HEADER_SIZE + self._buckets * self._ways * self._slot_size
+        )
+        self._key = (self._path, _HEADER.pack(
+            MAGIC, LAYOUT_VERSION, self._slot_size, self._buckets, self._ways,
+        ))
+        self._lock = _locks.setdefault(self._path, Lock())
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        # Дескриптор и отображение одни на процесс для пути и разметки:
+        # fcntl-блокировки принадлежат процессу, и закрытие любого
+        # дескриптора файла снимает их все, в том числе у других потоков.
+        # После fork файл открывается заново: блокировки не наследуются.
+        opened = _files.get(self._key)
+        if opened is None or opened[0] != os.getpid():
+            if opened is not None:
+                _, fd, mapped = opened
+                mapped.close()
+                os.close(fd)
+            opened = (os.getpid(),) + self._map_file()
+            _files[self._key] = opened
+        _, self._fd, self._map = opened
+
+    def _map_file(self):
+        header = self._key[1]
+        while True:
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            mapped = None
+            try:
+                if not self._is_current(fd):
+                    # пока ждали блокировку, файл заменили: берем новый
+                    continue
+                if os.fstat(fd).st_size == self._size and (
+                    os.pread(fd, _HEADER.size, 0) == header
+                ):
+                    mapped = mmap.mmap(fd, self._size)
+                    return fd, mapped
+                self._rebuild(header)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+                if mapped is None:
+                    os.close(fd)
+
+    def _is_current(self, fd):
+        try:
+            return os.stat(self._path).st_ino == os.fstat(fd).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _rebuild(self, header):
+        """Новый файл нужной разметки встает на место старого.
+
+        Старый не обрезается: другие процессы еще держат его в mmap
+        и на обрезанном получили бы SIGBUS. Они дорабатывают со старым
+        файлом, а новые открытия видят новый.
+        """
+        directory, name = os.path.split(self._path)
+        fd, temp = tempfile.mkstemp(prefix=f'.{name}.', dir=directory or '.')
+        try:
+            os.ftruncate(fd, self._size)
+            os.pwrite(fd, header, 0)
+            os.replace(temp, self._path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def _range(self, start, length):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    @contextmanager
+    def _bucket(self, bucket):
+        """Блокировка одной корзины; bucket=None — всего файла."""
+        with self._lock:
+            self._open()
+            start, length = (0, 0) if bucket is None else (bucket, 1)
+            with self._range(start, length):
+                yield
+
+    @contextmanager
+    def _buckets_of(self, keys, version):
+        """Ключи по корзинам под одним захватом блокировки процесса.
+
+        Корзины запираются по одной в порядке номеров, так что пачка
+        не держит весь файл и не может встать в дедлок с другой.
+        """
+        buckets = defaultdict(list)
+        for key in keys:
+            raw, key_hash, bucket = self._locate(key, version)
+            buckets[bucket].append((key, raw, key_hash))
+
+        def locked():
+            for bucket in sorted(buckets):
+                with self._range(bucket, 1):
+                    yield bucket, buckets[bucket]
+
+        with self._lock:
+            self._open()
+            yield locked()
+
+    def _hash(self, key):
+        digest = hashlib.blake2b(key, digest_size=8).digest()
+        return int.from_bytes(digest, 'little') | 1
+
+    def _offset(self, bucket, way):
+        slot = bucket * self._ways + way
+        return HEADER_SIZE + slot * self._slot_size
+
+    def _find(self, bucket, key_hash, key):
+        """Смещение слота с ключом или None. Просроченный слот чистится."""
+        now = time.time()
+        for way in range(self._ways):
+            offset = self._offset(bucket, way)
+            slot_hash, expires, _, key_len, _ = _SLOT.unpack_from(
+                self._map, offset
+            )
+            if slot_hash != key_hash:
+                continue
+            start = offset + _SLOT.size
+            if self._map[start:start + key_len] != key:
+                continue
+            if expires <= now:
+                _SLOT.pack_into(self._map, offset, 0, 0, 0, 0, 0)
+                return None
+            return offset
+        return None
+
+    def _victim(self, bucket):
+        """Свободный или просроченный слот, иначе самый давний."""
+        now = time.time()
+        victim, oldest = None, math.inf
+        for way in range(self._ways):
+            offset = self._offset(bucket, way)
+            slot_hash, expires, accessed, _, _ = _SLOT.unpack_from(
+                self._map, offset
+            )
+            if not slot_hash or expires <= now:
+                return offset
+            if accessed < oldest:
+                victim, oldest = offset, accessed
+        return victim
+
+    def _read(self, offset):
+        _, _, _, key_len, value_len = _SLOT.unpack_from(self._map, offset)
+        start = offset + _SLOT.size + key_len
+        return self._map[start:start + value_len]
+
+    def _write(self, offset, key_hash, key, pickled, expires):
+        _SLOT.pack_into(
+            self._map, offset, key_hash, expires, time.time(),
+            len(key), len(pickled),
+        )
+        start = offset + _SLOT.size
+        self._map[start:start + len(key)] = key
+        start += len(key)
+        self._map[start:start + len(pickled)] = pickled
+
+    def _touch(self, offset):
+        # поле «последнее обращение» идет после хэша и срока жизни
+        struct.pack_into('<d', self._map, offset + 16, time.time())
+
+    def _expiry(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return math.inf if expires is None else expires
+
+    def _locate(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        raw = key.encode()
+        key_hash = self._hash(raw)
+        return raw, key_hash, key_hash % self._buckets
+
+    def _store(self, raw, key_hash, bucket, pickled, timeout, only_new):
+        offset = self._find(bucket, key_hash, raw)
+        if offset is not None and only_new:
+            return False
+        if _SLOT.size + len(raw) + len(pickled) > self._slot_size:
+            # Не влезает в слот: старое значение не должно остаться.
+            if offset is not None:
+                _SLOT.pack_into(self._map, offset, 0, 0, 0, 0, 0)
+            return False
+        if offset is None:
+            offset = self._victim(bucket)
+        self._write(offset, key_hash, raw, pickled, self._expiry(timeout))
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        raw, key_hash, bucket = self._locate(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._bucket(bucket):
+            return self._store(raw, key_hash, bucket, pickled, timeout, True)
+
+    def get(self, key, default=None, version=None):
+        raw, key_hash, bucket = self._locate(key, version)
+        with self._bucket(bucket):
+            offset = self._find(bucket, key_hash, raw)
+            if offset is None:
+                metrics.cache_lookups(0, 1)
+                return default
+            self._touch(offset)
+            pickled = self._read(offset)
+        metrics.cache_lookups(1, 0)
+        return pickle.loads(pickled)
+
+    def get_many(self, keys, version=None):
+        found, misses = {}, 0
+        with self._buckets_of(keys, version) as buckets:
+            for bucket, items in buckets:
+                for key, raw, key_hash in items:
+                    offset = self._find(bucket, key_hash, raw)
+                    if offset is None:
+                        misses += 1
+                    else:
+                        self._touch(offset)
+                        found[key] = self._read(offset)
+        metrics.cache_lookups(len(found), misses)
+        return {key: pickle.loads(value) for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        raw, key_hash, bucket = self._locate(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._bucket(bucket):
+            self._store(raw, key_hash, bucket, pickled, timeout, False)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        pickled = {
+            key: pickle.dumps(value, self.pickle_protocol)
+            for key, value in data.items()
+        }
+        failed = []
+        with self._buckets_of(pickled, version) as buckets:
+            for bucket, items in buckets:
+                for key, raw, key_hash in items:
+                    if not self._store(
+                        raw, key_hash, bucket, pickled[key], timeout, False
+                    ):
+                        failed.append(key)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        raw, key_hash, bucket = self._locate(key, version)
+        with self._bucket(bucket):
+            offset = self._find(bucket, key_hash, raw)
+            if offset is None:
+                return False
+            struct.pack_into(
+                '<dd', self._map, offset + 8,
+                self._expiry(timeout), time.time(),
+            )
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        raw, key_hash, bucket = self._locate(key, version)
+        with self._bucket(bucket):
+            offset = self._find(bucket, key_hash, raw)
+            if offset is None:
+                raise ValueError("Key '%s' not found" % raw.decode())
+            value = pickle.loads(self._read(offset)) + delta
+            expires = _SLOT.unpack_from(self._map, offset)[1]
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            self._write(offset, key_hash, raw, pickled, expires)
+        return value
+
+    def has_key(self, key, version=None):
+        raw, key_hash, bucket = self._locate(key, version)
+        with self._bucket(bucket):
+            return self._find(bucket, key_hash, raw) is not None
+
+    def delete(self, key, version=None):
+        raw, key_hash, bucket = self._locate(key, version)
+        with self._bucket(bucket):
+            offset = self._find(bucket, key_hash, raw)
+            if offset is not None:
+                _SLOT.pack_into(self._map, offset, 0, 0, 0, 0, 0)
+
+    def clear(self):
+        with self._bucket(None):
+            for slot in range(self._buckets * self._ways):
+                offset = HEADER_SIZE + slot * self._slot_size
+                _SLOT.pack_into(self._map, offset, 0, 0, 0, 0, 0)
+
+    def close(self, **kwargs):
+        # Файл держим открытым: close() зовется после каждого запроса.
+        pass
@@ -0,0 +1,383 @@
+"""Метрики представлений в текстовом формате Prometheus.
+
+MetricsMiddleware копит счетчики по имени представления в памяти
+процесса: запросы, гистограмму задержек, число и время SQL-запросов,
+время рендера шаблонов, попадания и промахи кэша, байты ответов.
+Время отдельных шаблонов, {% include %}, {% cache %} и циклов
+{% for %} копится в строках с ключом (представление, блок); в режиме
+DEBUG оно же уходит в заголовок Server-Timing.
+Не чаще раза в FLUSH_INTERVAL секунд процесс сбрасывает свои счетчики
+в отдельный файл в METRICS_DIR, а /metrics складывает файлы всех
+воркеров. Так на запрос приходится только сложение под Lock. Файлы
+завершившихся процессов /metrics вливает в общий файл BASE и удаляет.
+"""
+import bisect
+import fcntl
+import glob
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import Resolver404, resolve
+
+# верхние границы корзин гистограммы задержек, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FLUSH_INTERVAL = 1.0
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNRESOLVED = '<unresolved>'
+# счетчики завершившихся процессов и имена уже влитых в них файлов
+BASE = 'base.merged'
+LOCK = '.lock'
+
+# Поля строки представления; за ними — корзины гистограммы
+(
+    REQUESTS, SECONDS, QUERIES, QUERY_SECONDS, TEMPLATE_SECONDS,
+    CACHE_HITS, CACHE_MISSES, BYTES,
+) = range(8)
+FIELDS = 8
+# счетчики текущего запроса, которые пополняют хуки
+(
+    CURRENT_QUERIES, CURRENT_QUERY_SECONDS, CURRENT_TEMPLATE_SECONDS,
+    CURRENT_HITS, CURRENT_MISSES, CURRENT_BLOCKS,
+) = range(6)
+# поля строки блока шаблона
+RENDERS, RENDER_SECONDS = range(2)
+
+COUNTERS = (
+    (QUERIES, 'db_queries_total', 'SQL-запросов'),
+    (QUERY_SECONDS, 'db_query_seconds_total', 'Время SQL-запросов'),
+    (TEMPLATE_SECONDS, 'template_render_seconds_total', 'Время рендера'),
+    (CACHE_HITS, 'cache_hits_total', 'Попаданий в кэш'),
+    (CACHE_MISSES, 'cache_misses_total', 'Промахов кэша'),
+    (BYTES, 'response_bytes_total', 'Байт в ответах'),
+)
+BLOCK_COUNTERS = (
+    (RENDERS, 'template_block_renders_total', 'Рендеров блока шаблона'),
+    (
+        RENDER_SECONDS, 'template_block_seconds_total',
+        'Время блока шаблона, вложенные блоки входят в объемлющий',
+    ),
+)
+
+_state = threading.local()
+_lock = threading.Lock()
+_views = {}
+_process = {'pid': None, 'name': None, 'flushed': 0.0}
+
+
+def _current():
+    return getattr(_state, 'current', None)
+
+
+def directory():
+    return getattr(settings, 'METRICS_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'yatube-metrics'
+    )
+
+
+def cache_lookups(hits, misses):
+    """Зовется бэкендом кэша; вне запроса ничего не делает."""
+    current = _current()
+    if current is not None:
+        current[CURRENT_HITS] += hits
+        current[CURRENT_MISSES] += misses
+
+
+def _timed_query(execute, sql, params, many, context):
+    current = _current()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current[CURRENT_QUERIES] += 1
+        current[CURRENT_QUERY_SECONDS] += time.perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """Обработчик connection_created: таймер на все запросы соединения."""
+    if _timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_query)
+
+
+def _add_block(blocks, label, renders, seconds):
+    block = blocks.get(label)
+    if block is None:
+        block = blocks[label] = [0, 0.0]
+    block[RENDERS] += renders
+    block[RENDER_SECONDS] += seconds
+
+
+def timed_block(label, render, context):
+    """Рендер узла шаблона; время копится под меткой блока."""
+    current = _current()
+    if current is None:
+        return render(context)
+    start = time.perf_counter()
+    try:
+        return render(context)
+    finally:
+        _add_block(
+            current[CURRENT_BLOCKS], label, 1, time.perf_counter() - start
+        )
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        current = _current()
+        if current is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            seconds = time.perf_counter() - start
+            current[CURRENT_TEMPLATE_SECONDS] += seconds
+            origin = self.origin
+            _add_block(
+                current[CURRENT_BLOCKS],
+                f'template {origin.template_name or origin.name}', 1, seconds,
+            )
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Движок шаблонов Django, который считает время рендера."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(
+            super().from_string(template_code).template, self
+        )
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self
+        )
+
+
+def view_name(request):
+    match = request.resolver_match
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return UNRESOLVED
+    return match.view_name
+
+
+def record(name, seconds, current, size):
+    with _lock:
+        row = _views.get(name)
+        if row is None:
+            row = _views[name] = [0] * (FIELDS + len(BUCKETS))
+        row[REQUESTS] += 1
+        row[SECONDS] += seconds
+        row[QUERIES] += current[CURRENT_QUERIES]
+        row[QUERY_SECONDS] += current[CURRENT_QUERY_SECONDS]
+        row[TEMPLATE_SECONDS] += current[CURRENT_TEMPLATE_SECONDS]
+        row[CACHE_HITS] += current[CURRENT_HITS]
+        row[CACHE_MISSES] += current[CURRENT_MISSES]
+        row[BYTES] += size
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        if bucket < len(BUCKETS):
+            row[FIELDS + bucket] += 1
+        for label, (renders, spent) in current[CURRENT_BLOCKS].items():
+            _add_block(_views, (name, label), renders, spent)
+    if time.monotonic() - _process['flushed'] >= FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Пишет счетчики процесса в его файл атомарной заменой."""
+    pid = os.getpid()
+    if _process['pid'] != pid:
+        # после fork счетчики родителя уже лежат в его файле
+        with _lock:
+            if _process['pid'] is not None:
+                _views.clear()
+            _process['pid'] = pid
+            _process['name'] = f'{pid}-{time.time_ns()}.pickle'
+    with _lock:
+        data = pickle.dumps(_views, pickle.HIGHEST_PROTOCOL)
+        _process['flushed'] = time.monotonic()
+    os.makedirs(directory(), exist_ok=True)
+    path = os.path.join(directory(), _process['name'])
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+def _load(path):
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _add(total, views):
+    for name, row in views.items():
+        summed = total.setdefault(name, [0] * len(row))
+        for index, value in enumerate(row):
+            summed[index] += value
+
+
+def _alive(name):
+    try:
+        pid = int(name.split('-', 1)[0])
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        # тот же pid мог достаться и процессу, что уже завершился
+        return name == _process['name']
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Счетчики всех процессов, сложенные по представлениям.
+
+    Файлы завершившихся процессов вливаются в BASE, иначе их копилось
+    бы по одному на каждый перезапуск воркера.
+    """
+    flush()
+    path = directory()
+    with open(os.path.join(path, LOCK), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        base, merged = _load(os.path.join(path, BASE)) or ({}, set())
+        total, dead = {}, []
+        _add(total, base)
+        for file in glob.glob(os.path.join(path, '*.pickle')):
+            name = os.path.basename(file)
+            if name in merged:
+                # уже в BASE, прошлый сбор не успел удалить
+                os.remove(file)
+                continue
+            views = _load(file)
+            if views is None:
+                continue
+            _add(total, views)
+            if not _alive(name):
+                _add(base, views)
+                dead.append(file)
+        if dead:
+            temporary = os.path.join(path, f'{BASE}.{os.getpid()}.tmp')
+            with open(temporary, 'wb') as out:
+                pickle.dump(
+                    (base, {os.path.basename(file) for file in dead}),
+                    out, pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(temporary, os.path.join(path, BASE))
+            for file in dead:
+                os.remove(file)
+    return total
+
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+def _label(name):
+    if isinstance(name, tuple):
+        view, block = name
+        return f'view="{_escape(view)}",block="{_escape(block)}"'
+    return f'view="{_escape(name)}"'
+
+
+def exposition(views, prefix='yatube'):
+    """Текст для Prometheus по сложенным счетчикам."""
+    names = sorted(name for name in views if isinstance(name, str))
+    blocks = sorted(name for name in views if isinstance(name, tuple))
+    lines = [
+        f'# HELP {prefix}_requests_total Запросов к представлению',
+        f'# TYPE {prefix}_requests_total counter',
+    ]
+    lines += [
+        f'{prefix}_requests_total{{{_label(name)}}} {views[name][REQUESTS]}'
+        for name in names
+    ]
+    metric = f'{prefix}_request_duration_seconds'
+    lines += [
+        f'# HELP {metric} Время ответа представления',
+        f'# TYPE {metric} histogram',
+    ]
+    for name in names:
+        row, label = views[name], _label(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, row[FIELDS:]):
+            cumulative += count
+            lines.append(
+                f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}'
+            )
+        lines += [
+            f'{metric}_bucket{{{label},le="+Inf"}} {row[REQUESTS]}',
+            f'{metric}_sum{{{label}}} {row[SECONDS]}',
+            f'{metric}_count{{{label}}} {row[REQUESTS]}',
+        ]
+    for field, suffix, title in COUNTERS:
+        metric = f'{prefix}_{suffix}'
+        lines += [f'# HELP {metric} {title}', f'# TYPE {metric} counter']
+        lines += [
+            f'{metric}{{{_label(name)}}} {views[name][field]}'
+            for name in names
+        ]
+    for field, suffix, title in BLOCK_COUNTERS:
+        metric = f'{prefix}_{suffix}'
+        lines += [f'# HELP {metric} {title}', f'# TYPE {metric} counter']
+        lines += [
+            f'{metric}{{{_label(name)}}} {views[name][field]}'
+            for name in blocks
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def server_timing(current, seconds):
+    """Заголовок Server-Timing; блоки вложены, их время пересекается."""
+    entries = [
+        f'total;dur={seconds * 1000:.2f}',
+        f'db;dur={current[CURRENT_QUERY_SECONDS] * 1000:.2f};'
+        f'desc="SQL x{current[CURRENT_QUERIES]}"',
+    ]
+    blocks = sorted(
+        current[CURRENT_BLOCKS].items(),
+        key=lambda item: item[1][RENDER_SECONDS], reverse=True,
+    )
+    for number, (label, (renders, spent)) in enumerate(blocks):
+        entries.append(
+            f'tpl{number};dur={spent * 1000:.2f};'
+            f'desc="{_escape(label)} x{renders}"'
+        )
+    return ', '.join(entries)
+
+
+class MetricsMiddleware:
+    """Ставится первым, чтобы в замер попали и остальные middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current = _state.current = [0, 0.0, 0.0, 0, 0, {}]
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.current = None
+        seconds = time.perf_counter() - start
+        size = 0 if response.streaming else len(response.content)
+        record(view_name(request), seconds, current, size)
+        if settings.DEBUG:
+            response['Server-Timing'] = server_timing(current, seconds)
+        return response
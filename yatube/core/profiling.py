@@ -0,0 +1,202 @@
+"""Профилирование отдельных запросов через cProfile.
+
+Запрос профилируется, если сотрудник прислал заголовок X-Profile, если
+в адресе есть подписанный для этого сотрудника параметр _profile
+(ссылку дает страница профилей в админке) или если выпал случай 1 из
+PROFILE_SAMPLE_RATE. Имя прогона в заголовке ответа X-Profile видят
+только сотрудники.
+Для каждого прогона в PROFILE_DIR ложатся три файла: .pstats от
+cProfile для pstats/snakeviz, .collapsed — выборка стеков для
+flamegraph.pl и speedscope, и .json с описанием. Хранятся последние
+PROFILE_KEEP прогонов.
+"""
+import cProfile
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+
+from . import metrics
+
+HEADER = 'HTTP_X_PROFILE'
+PARAM = '_profile'
+SALT = 'core.profiling'
+TOKEN_MAX_AGE = 24 * 60 * 60
+DEFAULT_KEEP = 100
+# глубже стеки во flamegraph обрезаются со стороны корня
+MAX_DEPTH = 64
+# чаще снимать нет смысла: поток запроса отдает GIL раз в
+# sys.getswitchinterval() (5 мс)
+DEFAULT_INTERVAL = 0.005
+
+
+def directory():
+    return getattr(settings, 'PROFILE_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'yatube-profiles'
+    )
+
+
+def token(user):
+    """Подпись для параметра _profile, действует TOKEN_MAX_AGE секунд.
+
+    В подписи id сотрудника: утекшая ссылка без его входа не работает.
+    """
+    return signing.dumps({'user': user.pk}, salt=SALT)
+
+
+def _valid(value, user):
+    try:
+        data = signing.loads(value, salt=SALT, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return isinstance(data, dict) and data.get('user') == user.pk
+
+
+def reason(request):
+    """Почему запрос профилируется, или None."""
+    user = getattr(request, 'user', None)
+    staff = user is not None and user.is_staff
+    if HEADER in request.META and staff:
+        return 'header'
+    if PARAM in request.GET and staff and _valid(request.GET[PARAM], user):
+        return 'token'
+    rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+    if rate and random.randrange(rate) == 0:
+        return 'sample'
+    return None
+
+
+def _label(code):
+    filename = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler(threading.Thread):
+    """Снимает стек потока запроса каждые interval секунд.
+
+    По графу вызовов cProfile стеки не восстановить: цепочка
+    middleware — это одна и та же обертка, вызванная рекурсивно. Стеки
+    для пламени поэтому собираются выборкой, как у py-spy, и только
+    пока запрос профилируется.
+    """
+
+    def __init__(self, interval):
+        super().__init__(daemon=True, name='profile-sampler')
+        self.interval = interval
+        self.target = threading.get_ident()
+        # стек выше этого кадра — сервер и middleware до профилировщика
+        self.top = sys._getframe(1)
+        self.stacks = {}
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            labels, root = [], None
+            while frame is not None and frame is not self.top:
+                labels.append(_label(frame.f_code))
+                frame, root = frame.f_back, frame.f_code
+            # выборка, попавшая на остановку самого сэмплера, не нужна
+            if labels and root is not StackSampler.stop.__code__:
+                key = ';'.join(reversed(labels[:MAX_DEPTH]))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+    def collapsed(self):
+        """Стеки в свернутом формате: «a;b;c число выборок» по строке."""
+        return ''.join(
+            f'{stack} {count}\n'
+            for stack, count in sorted(self.stacks.items())
+        )
+
+
+def save(profiler, sampler, info):
+    """Пишет прогон в кольцо и удаляет самые старые сверх PROFILE_KEEP."""
+    path = directory()
+    os.makedirs(path, exist_ok=True)
+    name = f'{time.time_ns()}-{os.getpid()}'
+    base = os.path.join(path, name)
+    profiler.dump_stats(base + '.pstats')
+    with open(base + '.collapsed', 'w') as file:
+        file.write(sampler.collapsed())
+    # описание пишется последним: по нему прогон виден в списке
+    with open(base + '.json', 'w') as file:
+        json.dump({'name': name, **info}, file, ensure_ascii=False)
+    keep = getattr(settings, 'PROFILE_KEEP', DEFAULT_KEEP)
+    for old in sorted(glob.glob(os.path.join(path, '*.json')))[:-keep]:
+        for suffix in ('.json', '.pstats', '.collapsed'):
+            try:
+                os.remove(old[:-len('.json')] + suffix)
+            except FileNotFoundError:
+                pass
+    return name
+
+
+def recent():
+    """Описания прогонов, свежие первыми."""
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(directory(), '*.json'))):
+        try:
+            with open(path) as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return profiles[::-1]
+
+
+def file_path(name, suffix):
+    """Путь к файлу прогона; чужие имена не пропускаются."""
+    if suffix not in ('.pstats', '.collapsed') or not name.replace(
+        '-', ''
+    ).isdigit():
+        return None
+    path = os.path.join(directory(), name + suffix)
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """Ставится после AuthenticationMiddleware: нужен request.user."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        why = reason(request)
+        if why is None:
+            return self.get_response(request)
+        sampler = StackSampler(
+            getattr(settings, 'PROFILE_INTERVAL', DEFAULT_INTERVAL)
+        )
+        profiler = cProfile.Profile()
+        sampler.start()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            sampler.stop()
+        seconds = time.perf_counter() - start
+        name = save(profiler, sampler, {
+            'view': metrics.view_name(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(seconds * 1000, 3),
+            'user': getattr(request.user, 'username', '') or '',
+            'reason': why,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        if request.user.is_staff:
+            response['X-Profile'] = name
+        return response
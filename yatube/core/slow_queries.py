@@ -0,0 +1,226 @@
+"""Журнал медленных SQL-запросов с планами.
+
+Обертка вокруг каждого запроса замеряет время. Если запрос дольше
+SLOW_QUERY_MS, в потоке запроса собирается только дешевое: SQL,
+параметры, представление, строка в views.py и место в шаблоне.
+EXPLAIN и запись в файл делает фоновый поток, так что журнал не
+добавляет задержки ответу. Записи — JSON по строке в SLOW_QUERY_LOG.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD_MS = 100
+REDACTED = '<redacted>'
+EXPLAIN = {'sqlite': 'EXPLAIN QUERY PLAN ', 'mysql': 'EXPLAIN '}
+
+_state = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def threshold():
+    return getattr(settings, 'SLOW_QUERY_MS', DEFAULT_THRESHOLD_MS) / 1000
+
+
+def log_path():
+    return getattr(settings, 'SLOW_QUERY_LOG', None) or os.path.join(
+        tempfile.gettempdir(), 'yatube-slow-queries.jsonl'
+    )
+
+
+def fingerprint(sql):
+    """SQL без значений: литералы и списки IN сводятся к заглушкам."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r'\(\s*\?(\s*,\s*\?)*\s*\)', '(?+)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def fingerprint_id(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def redact(value):
+    """Строки и байты скрываются: там могут быть имена, почта, токены.
+
+    Числа, даты и None остаются — по ним видно, какие строки читались.
+    """
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return REDACTED
+
+
+# Модули оберток вокруг execute: их кадры лежат между запросом и
+# кодом, который его выполнил
+_WRAPPERS = {__file__, metrics.__file__}
+
+
+def _project_frame(frame):
+    """Строка views.py, с которой начался запрос.
+
+    Если запрос пришел не из представления, например из middleware,
+    берется ближайшая к нему строка кода проекта, не считая оберток.
+    """
+    base = str(settings.BASE_DIR)
+    nearest = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base) and 'site-packages' not in filename
+            and filename not in _WRAPPERS
+        ):
+            place = '{}:{} in {}'.format(
+                os.path.relpath(filename, base), frame.f_lineno,
+                frame.f_code.co_name,
+            )
+            if filename.endswith('views.py'):
+                return place
+            nearest = nearest or place
+        frame = frame.f_back
+    return nearest
+
+
+def _template_frame(frame):
+    """Узел шаблона, при рендере которого выполнился запрос."""
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                name = origin.template_name or origin.name
+                return f'{name}:{token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+def _entry(sql, params, seconds, alias):
+    frame = sys._getframe(2)
+    request = getattr(_state, 'request', None)
+    return {
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'ms': round(seconds * 1000, 3),
+        'alias': alias,
+        'sql': sql,
+        'params': redact(params),
+        'view': metrics.view_name(request) if request is not None else None,
+        'path': request.path if request is not None else None,
+        'frame': _project_frame(frame),
+        'template': _template_frame(frame),
+        'pid': os.getpid(),
+    }
+
+
+def _explain(alias, sql, params):
+    connection = connections[alias]
+    prefix = EXPLAIN.get(connection.vendor, 'EXPLAIN ')
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return [
+            ' '.join(str(column) for column in row)
+            if connection.vendor != 'sqlite' else row[-1]
+            for row in cursor.fetchall()
+        ]
+
+
+def _write(entry, params):
+    _state.explaining = True
+    try:
+        try:
+            entry['plan'] = _explain(entry['alias'], entry['sql'], params)
+        except Exception as error:
+            entry['plan'] = None
+            entry['plan_error'] = str(error)
+        normalized = fingerprint(entry['sql'])
+        entry['fingerprint'] = fingerprint_id(normalized)
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        path = log_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # одна запись — один write в режиме добавления: строки процессов
+        # не перемешиваются
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+    except Exception:
+        logger.exception('Не удалось записать медленный запрос')
+    finally:
+        _state.explaining = False
+        connections[entry['alias']].close()
+
+
+def _submit(entry, params):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(1, thread_name_prefix='slow-queries')
+    _pool.submit(_write, entry, params)
+
+
+def drain():
+    """Ждет, пока фоновый поток допишет все записи."""
+    if _pool is not None:
+        _pool.submit(lambda: None).result()
+
+
+def _watch(alias):
+    def watch(execute, sql, params, many, context):
+        if getattr(_state, 'explaining', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            if seconds >= threshold():
+                # у executemany в журнал и в EXPLAIN идет первый набор
+                first = list((params[0] if many and params else params) or [])
+                _submit(_entry(sql, first, seconds, alias), first)
+    watch.slow_queries = True
+    return watch
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик connection_created: журнал на все запросы соединения."""
+    if not any(
+        getattr(wrapper, 'slow_queries', False)
+        for wrapper in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(_watch(connection.alias))
+
+
+class SlowQueryMiddleware:
+    """Запоминает запрос потока, чтобы записи знали представление."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.request = request
+        try:
+            return self.get_response(request)
+        finally:
+            _state.request = None
@@ -0,0 +1,144 @@
+"""Хранилище файлов, адресуемых по содержимому.
+
+Имя файла — sha256 содержимого с исходным расширением, каталог берется
+из upload_to. Хэш считается на лету, пока загрузка пишется во временный
+файл, после чего тот становится жесткой ссылкой под итоговым именем.
+Одинаковые загрузки дают одно имя и один файл на диске, поэтому их
+можно отдавать с Cache-Control: immutable.
+
+Внутри каталога файлы раскладываются по подкаталогам из первых байт
+хэша: posts/ab/cd/abcd….jpg. Так в одном каталоге не больше нескольких
+сотен файлов даже при миллионах картинок.
+
+Повторная загрузка уже лежащего файла обновляет его mtime под flock, а
+сборка мусора (posts.media.collect) берет тот же flock и не трогает
+недавно загруженные файлы: ссылка на них вот-вот появится в базе.
+"""
+import fcntl
+import hashlib
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+INCOMING_DIR = '.incoming'
+# два уровня по два hex-символа: 65536 каталогов
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}(\.\w+)?$')
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.match(os.path.basename(name)))
+
+
+def sharded_name(directory, digest, extension):
+    shards = [
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_LEVELS)
+    ]
+    return '/'.join([directory, *shards, digest + extension]).lstrip('/')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя станет известно только в _save по содержимому,
+        # а совпадение имен здесь и есть дедупликация.
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        incoming = self.path(INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            name = sharded_name(directory, digest.hexdigest(), extension)
+            self._link(temp_path, name)
+        finally:
+            os.unlink(temp_path)
+        return name
+
+    def _link(self, path, name):
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        while True:
+            try:
+                os.link(path, full_path)
+                return
+            except FileExistsError:
+                pass
+            with self._locked(full_path) as fd:
+                # файла нет — его как раз удалили: связываем заново
+                if fd is not None:
+                    os.utime(fd)
+                    return
+
+    @contextmanager
+    def _locked(self, full_path):
+        """Дескриптор файла под flock или None, если файла уже нет."""
+        try:
+            fd = os.open(full_path, os.O_RDONLY)
+        except FileNotFoundError:
+            yield None
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(full_path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                current = False
+            yield fd if current else None
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def exclusive(self, name):
+        """Файл заперт от повторной загрузки того же содержимого.
+
+        Отдает время последней записи или загрузки файла, None — файла
+        нет.
+        """
+        with self._locked(self.path(name)) as fd:
+            yield None if fd is None else os.fstat(fd).st_mtime
+
+    def adopt(self, name, directory):
+        """Переносит лежащий файл в схему хранилища, возвращает новое имя.
+
+        Файл связывается жесткой ссылкой под новым именем, старое имя
+        остается до удаления вызывающим. Содержимое хэшируется, только
+        если старое имя еще не хэш.
+        """
+        base, extension = os.path.splitext(os.path.basename(name))
+        extension = extension.lower()
+        if is_hashed(name):
+            digest = base
+        else:
+            hasher = hashlib.sha256()
+            with self.open(name) as source:
+                for chunk in source.chunks():
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+        new_name = sharded_name(directory, digest, extension)
+        if new_name != name:
+            self._link(self.path(name), new_name)
+        return new_name
+
+
+def media_cache_control(name):
+    """Заголовок Cache-Control для файла из MEDIA_ROOT или None."""
+    if is_hashed(name):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return None
@@ -0,0 +1,14 @@
+"""{% cache %} с замером времени, подключается вместо cache."""
+from django import template
+from django.templatetags import cache
+
+from .timing import QUOTES, timed
+
+register = template.Library()
+
+
+def fragment_label(parser, token):
+    return f'cache {token.split_contents()[2].strip(QUOTES)}'
+
+
+register.tag('cache', timed(cache.do_cache, fragment_label))
@@ -0,0 +1,42 @@
+"""Теги шаблонов Django, которые замеряют свое время.
+
+Библиотека подключена в OPTIONS['builtins'] и подменяет встроенные
+{% extends %}, {% include %} и {% for %}; {% cache %} подменяет
+timed_cache из OPTIONS['libraries']. Узлы остаются теми же, только их
+render идет через metrics.timed_block.
+"""
+from functools import partial
+
+from core import metrics
+from django import template
+from django.template import defaulttags, loader_tags
+
+register = template.Library()
+
+QUOTES = '\'"'
+
+
+def timed(compile_function, label):
+    def compile_timed(parser, token):
+        node = compile_function(parser, token)
+        node.render = partial(
+            metrics.timed_block, label(parser, token), node.render
+        )
+        return node
+    return compile_timed
+
+
+def template_label(parser, token):
+    tag, name = token.split_contents()[:2]
+    return f'{tag} {name.strip(QUOTES)}'
+
+
+def place_label(parser, token):
+    origin = parser.origin
+    name = origin.template_name or origin.name if origin else '?'
+    return f'{token.split_contents()[0]} {name}:{token.lineno}'
+
+
+register.tag('extends', timed(loader_tags.do_extends, template_label))
+register.tag('include', timed(loader_tags.do_include, template_label))
+register.tag('for', timed(defaulttags.do_for, place_label))
@@ -0,0 +1,38 @@
+"""Запуск тестов с кэшами и рабочими файлами во временной папке.
+
+Файл кэша из настроек общий для всех воркеров деплоя, а тесты
+зовут cache.clear(): на общем файле они стирали бы рабочий кэш.
+Счетчики, медленные запросы и профили тестов так же попали бы
+в файлы деплоя.
+"""
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .cache import isolated_caches
+
+
+def isolated_settings(directory):
+    """Настройки, которые тесты переносят в directory."""
+    return {
+        'CACHES': isolated_caches(directory),
+        'METRICS_DIR': os.path.join(directory, 'metrics'),
+        'SLOW_QUERY_LOG': os.path.join(directory, 'slow-queries.jsonl'),
+        'PROFILE_DIR': os.path.join(directory, 'profiles'),
+    }
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-test-cache-')
+        self.caches = override_settings(**isolated_settings(self.cache_dir))
+        self.caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
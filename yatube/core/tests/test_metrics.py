@@ -0,0 +1,181 @@
+# Тесты метрик представлений
+# core/tests/test_metrics.py
+import glob
+import os
+import pickle
+import shutil
+import tempfile
+
+from core import metrics
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post, User
+
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+
+
+class ExpositionTest(SimpleTestCase):
+    def row(self, requests, buckets):
+        row = [0] * (metrics.FIELDS + len(metrics.BUCKETS))
+        row[metrics.REQUESTS] = requests
+        row[metrics.QUERIES] = 7
+        row[metrics.FIELDS:metrics.FIELDS + len(buckets)] = buckets
+        return row
+
+    def test_histogram_is_cumulative(self):
+        """Корзины гистограммы накопительные, +Inf равна числу запросов"""
+        text = metrics.exposition({'posts:index': self.row(4, [1, 2])})
+        label = 'view="posts:index"'
+        for line in (
+            f'yatube_requests_total{{{label}}} 4',
+            f'yatube_request_duration_seconds_bucket{{{label},le="0.005"}} 1',
+            f'yatube_request_duration_seconds_bucket{{{label},le="0.01"}} 3',
+            f'yatube_request_duration_seconds_bucket{{{label},le="10"}} 3',
+            f'yatube_request_duration_seconds_bucket{{{label},le="+Inf"}} 4',
+            f'yatube_db_queries_total{{{label}}} 7',
+            '# TYPE yatube_request_duration_seconds histogram',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line + '\n', text)
+
+    def test_label_is_escaped(self):
+        """Кавычки и обратные косые в имени экранируются"""
+        text = metrics.exposition({'a"b\\c': self.row(1, [1])})
+        self.assertIn('yatube_requests_total{view="a\\"b\\\\c"} 1', text)
+
+
+class IsolatedFilesTest(SimpleTestCase):
+    def test_metrics_outside_deployment(self):
+        """Тестовые запросы не пишут счетчики в папку деплоя"""
+        deployment = os.path.join(
+            tempfile.gettempdir(), settings.DEPLOYMENT_NAME
+        )
+        self.assertFalse(metrics.directory().startswith(deployment))
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        Post.objects.create(text='Пост', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+        metrics._views.clear()
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def scrape(self):
+        response = self.staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_view_is_measured(self):
+        """Запрос, SQL, рендер и байты попадают в строку представления"""
+        response = Client().get(reverse('posts:index'))
+        row = metrics._views['posts:index']
+        self.assertEqual(row[metrics.REQUESTS], 1)
+        self.assertGreater(row[metrics.QUERIES], 0)
+        self.assertGreater(row[metrics.QUERY_SECONDS], 0)
+        self.assertGreater(row[metrics.TEMPLATE_SECONDS], 0)
+        self.assertGreater(row[metrics.CACHE_MISSES], 0)
+        self.assertEqual(row[metrics.BYTES], len(response.content))
+        self.assertIn(
+            'yatube_requests_total{view="posts:index"} 1', self.scrape()
+        )
+
+    def test_template_blocks_are_measured(self):
+        """Шаблоны, include, cache и циклы считаются по представлению"""
+        Client().get(reverse('posts:index'))
+        blocks = {
+            name[1]: row for name, row in metrics._views.items()
+            if isinstance(name, tuple) and name[0] == 'posts:index'
+        }
+        for label in (
+            'template posts/index.html',
+            'extends base.html',
+            'include posts/includes/paginator.html',
+            'cache index_page',
+        ):
+            with self.subTest(label=label):
+                self.assertEqual(blocks[label][metrics.RENDERS], 1)
+                self.assertGreater(blocks[label][metrics.RENDER_SECONDS], 0)
+        self.assertTrue(any(
+            label.startswith('for posts/index.html:') for label in blocks
+        ))
+        self.assertIn(
+            'yatube_template_block_renders_total{view="posts:index",'
+            'block="include posts/includes/paginator.html"} 1',
+            self.scrape(),
+        )
+
+    def test_server_timing_in_debug(self):
+        """Server-Timing отдается только в режиме DEBUG"""
+        response = Client().get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        cache.clear()
+        with self.settings(DEBUG=True):
+            response = Client().get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=')
+        self.assertIn('desc="cache index_page x1"', timing)
+
+    def test_cached_page_keeps_view_name(self):
+        """Страница из кэша анонимов считается тем же представлением"""
+        Client().get(reverse('posts:index'))
+        Client().get(reverse('posts:index'))
+        row = metrics._views['posts:index']
+        self.assertEqual(row[metrics.REQUESTS], 2)
+        self.assertGreater(row[metrics.CACHE_HITS], 0)
+        self.assertNotIn(metrics.UNRESOLVED, metrics._views)
+
+    def test_processes_are_summed(self):
+        """Файлы других воркеров складываются с текущим процессом"""
+        Client().get(reverse('about:tech'))
+        other = [0] * (metrics.FIELDS + len(metrics.BUCKETS))
+        other[metrics.REQUESTS] = 5
+        os.makedirs(TEMP_METRICS_DIR, exist_ok=True)
+        with open(os.path.join(TEMP_METRICS_DIR, '1-1.pickle'), 'wb') as f:
+            pickle.dump({'about:tech': other}, f)
+        self.assertIn(
+            'yatube_requests_total{view="about:tech"} 6', self.scrape()
+        )
+
+    def test_dead_processes_are_merged(self):
+        """Файлы завершившихся процессов вливаются в общий и удаляются"""
+        row = [0] * (metrics.FIELDS + len(metrics.BUCKETS))
+        row[metrics.REQUESTS] = 3
+        os.makedirs(TEMP_METRICS_DIR, exist_ok=True)
+        # такого pid не бывает: процесс считается завершившимся
+        dead = os.path.join(TEMP_METRICS_DIR, '999999999-1.pickle')
+        with open(dead, 'wb') as f:
+            pickle.dump({'posts:dead': row}, f)
+        for _ in range(2):
+            views = metrics.collect()
+            self.assertEqual(views['posts:dead'][metrics.REQUESTS], 3)
+        self.assertFalse(os.path.exists(dead))
+        self.assertEqual(
+            len(glob.glob(os.path.join(TEMP_METRICS_DIR, '*.pickle'))), 1
+        )
+
+    def test_staff_only(self):
+        """Не сотрудникам /metrics не отдается"""
+        client = Client()
+        client.force_login(self.author)
+        for user_client in (Client(), client):
+            with self.subTest(client=user_client):
+                response = user_client.get(reverse('metrics'))
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('/admin/login/', response['Location'])
@@ -0,0 +1,169 @@
+# Тесты общего кэша в mmap-файле
+# core/tests/test_mmapcache.py
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from core.cache.mmapcache import MmapCache
+from django.test import SimpleTestCase
+
+WORKERS = 4
+
+
+def make_cache(path, **options):
+    return MmapCache(path, {'OPTIONS': options})
+
+
+def incr_worker(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+def set_worker(path, worker, count):
+    cache = make_cache(path)
+    for i in range(count):
+        cache.set(f'key:{worker}:{i}', (worker, i))
+
+
+def throughput_worker(path, worker, count):
+    cache = make_cache(path)
+    for i in range(count):
+        cache.set(f'load:{worker}:{i % 100}', i)
+        cache.get(f'load:{worker}:{i % 100}')
+
+
+class MmapCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache')
+        self.cache = make_cache(self.path)
+        self.context = multiprocessing.get_context('fork')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def run_workers(self, target, make_args):
+        processes = [
+            self.context.Process(target=target, args=make_args(worker))
+            for worker in range(WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+
+    def test_basic_operations(self):
+        """set/get/add/delete/incr/clear"""
+        self.cache.set('a', {'x': 1})
+        self.assertEqual(self.cache.get('a'), {'x': 1})
+        self.assertFalse(self.cache.add('a', 2))
+        self.assertTrue(self.cache.add('b', 2))
+        self.assertEqual(self.cache.incr('b', 3), 5)
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_many(self):
+        """get_many/set_many одной пачкой"""
+        data = {f'many:{i}': i for i in range(50)}
+        data['big'] = b'x' * 32 * 1024
+        self.assertEqual(self.cache.set_many(data), ['big'])
+        del data['big']
+        self.assertEqual(
+            self.cache.get_many(list(data) + ['missing']), data
+        )
+
+    def test_ttl(self):
+        """Запись со сроком жизни пропадает после него"""
+        self.cache.set('short', 1, 0.05)
+        self.cache.set('long', 1, None)
+        self.assertEqual(self.cache.get('short'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('long'), 1)
+
+    def test_lru_eviction(self):
+        """При нехватке слотов вытесняется давно не читанный ключ"""
+        cache = make_cache(
+            self.path + '.small', SLOT_SIZE=256, WAYS=2, MAX_SIZE=512
+        )
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_too_large_value_drops_old_one(self):
+        """Значение больше слота не сохраняется и не оставляет старое"""
+        cache = make_cache(self.path + '.small', SLOT_SIZE=256, WAYS=2)
+        cache.set('a', 1)
+        cache.set('a', 'x' * 1024)
+        self.assertIsNone(cache.get('a'))
+
+    def test_layout_change_replaces_file(self):
+        """Другая разметка ставит новый файл, открытый не обрезается"""
+        self.cache.set('a', 1)
+        other = make_cache(self.path, SLOT_SIZE=1024, MAX_SIZE=1024 * 1024)
+        self.assertIsNone(other.get('a'))
+        other.set('b', 2)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(
+            os.path.getsize(self.path), 64 + 1024 * 1024
+        )
+        self.assertEqual(os.listdir(self.dir), ['cache'])
+
+    def test_threads_share_descriptor(self):
+        """Экземпляры из разных потоков не открывают файл заново"""
+        self.cache.set('a', 1)
+
+        def use_cache(i):
+            cache = make_cache(self.path)
+            cache.set(f'thread:{i}', i)
+            cache.get('a')
+
+        opened = len(os.listdir('/proc/self/fd'))
+        threads = [
+            threading.Thread(target=use_cache, args=(i,)) for i in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(os.listdir('/proc/self/fd')), opened)
+        self.assertEqual(self.cache.get('thread:49'), 49)
+
+    def test_processes_share_data(self):
+        """Все процессы видят записи друг друга"""
+        self.run_workers(set_worker, lambda worker: (self.path, worker, 50))
+        for worker in range(WORKERS):
+            for i in range(50):
+                self.assertEqual(
+                    self.cache.get(f'key:{worker}:{i}'), (worker, i)
+                )
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из разных процессов не теряет обновлений"""
+        self.cache.set('counter', 0)
+        self.run_workers(incr_worker, lambda worker: (self.path, 200))
+        self.assertEqual(self.cache.get('counter'), WORKERS * 200)
+
+    def test_throughput(self):
+        """Пропускная способность при параллельной работе процессов"""
+        count = 2000
+        start = time.perf_counter()
+        self.run_workers(
+            throughput_worker, lambda worker: (self.path, worker, count)
+        )
+        elapsed = time.perf_counter() - start
+        ops_per_second = WORKERS * count * 2 / elapsed
+        self.assertGreater(ops_per_second, 5000)
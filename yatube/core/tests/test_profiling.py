@@ -0,0 +1,152 @@
+# Тесты профилирования запросов
+# core/tests/test_profiling.py
+import os
+import shutil
+import tempfile
+import time
+
+from core import profiling
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post, User
+
+TEMP_PROFILE_DIR = tempfile.mkdtemp()
+
+
+def leaf():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def branch():
+    leaf()
+
+
+class StackSamplerTest(SimpleTestCase):
+    def test_stacks_follow_calls(self):
+        """Стеки идут от профилируемого кадра к листу, без кадров выше"""
+        sampler = profiling.StackSampler(0.005)
+        sampler.start()
+        branch()
+        sampler.stop()
+        text = sampler.collapsed()
+        self.assertIn(
+            f'branch (test_profiling.py:{branch.__code__.co_firstlineno});'
+            f'leaf (test_profiling.py:{leaf.__code__.co_firstlineno}) ',
+            text,
+        )
+        for line in text.splitlines():
+            self.assertRegex(line, r'^branch .* \d+$')
+
+
+class IsolatedFilesTest(SimpleTestCase):
+    def test_profiles_outside_deployment(self):
+        """Профили тестовых запросов не ложатся в папку деплоя"""
+        deployment = os.path.join(
+            tempfile.gettempdir(), settings.DEPLOYMENT_NAME
+        )
+        self.assertFalse(profiling.directory().startswith(deployment))
+
+
+@override_settings(PROFILE_DIR=TEMP_PROFILE_DIR, PROFILE_KEEP=2)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        Post.objects.create(text='Пост', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_header_from_staff(self):
+        """Заголовок X-Profile профилирует запрос только у сотрудника"""
+        url = reverse('posts:index')
+        response = self.staff_client.get(url, HTTP_X_PROFILE='1')
+        name = response['X-Profile']
+        for suffix in ('.pstats', '.collapsed', '.json'):
+            with self.subTest(suffix=suffix):
+                self.assertTrue(os.path.exists(
+                    os.path.join(TEMP_PROFILE_DIR, name + suffix)
+                ))
+        [profile] = profiling.recent()
+        self.assertEqual(profile['view'], 'posts:index')
+        self.assertEqual(profile['reason'], 'header')
+        response = self.author_client.get(url, HTTP_X_PROFILE='1')
+        self.assertFalse(response.has_header('X-Profile'))
+
+    def test_signed_parameter(self):
+        """Подпись работает только у того сотрудника, кому выдана"""
+        url = reverse('posts:index')
+        token = profiling.token(self.staff)
+        response = self.staff_client.get(url, {'_profile': token})
+        self.assertTrue(response.has_header('X-Profile'))
+        for client, value in (
+            (Client(), token),
+            (self.author_client, token),
+            (self.staff_client, 'profile:forged'),
+            (self.staff_client, profiling.token(self.author)),
+        ):
+            with self.subTest(value=value):
+                response = client.get(url, {'_profile': value})
+                self.assertFalse(response.has_header('X-Profile'))
+        self.assertEqual(len(profiling.recent()), 1)
+
+    def test_sampling(self):
+        """При PROFILE_SAMPLE_RATE=1 профилируется каждый запрос"""
+        with self.settings(PROFILE_SAMPLE_RATE=1):
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(profiling.recent()[0]['reason'], 'sample')
+        # анониму имя прогона не показывается
+        self.assertFalse(response.has_header('X-Profile'))
+
+    def test_ring_is_bounded(self):
+        """Хранятся только последние PROFILE_KEEP прогонов"""
+        names = [
+            self.staff_client.get(
+                reverse('posts:index'), HTTP_X_PROFILE='1'
+            )['X-Profile']
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            [profile['name'] for profile in profiling.recent()],
+            names[:0:-1],
+        )
+        self.assertEqual(len(os.listdir(TEMP_PROFILE_DIR)), 6)
+
+    def test_admin_page(self):
+        """Страница профилей — только для сотрудников, файлы отдаются"""
+        name = self.staff_client.get(
+            reverse('posts:profile', args=['Author']), HTTP_X_PROFILE='1'
+        )['X-Profile']
+        response = self.author_client.get(reverse('profiles'))
+        self.assertEqual(response.status_code, 302)
+        response = self.staff_client.get(
+            reverse('profiles'), {'view': 'posts:profile', 'o': 'ms'}
+        )
+        self.assertContains(response, '/profile/Author/')
+        for kind in ('pstats', 'collapsed'):
+            with self.subTest(kind=kind):
+                response = self.staff_client.get(
+                    reverse('profile_file', args=[name, kind])
+                )
+                self.assertEqual(response.status_code, 200)
+                response.close()
+        response = self.staff_client.get(
+            reverse('profile_file', args=[name, 'json'])
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,131 @@
+# Тесты журнала медленных запросов
+# core/tests/test_slow_queries.py
+import json
+import os
+import re
+import tempfile
+from io import StringIO
+
+from core import slow_queries
+from django.conf import settings
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post, User
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_values_are_dropped(self):
+        """Запросы, разные только значениями, дают один отпечаток"""
+        first = slow_queries.fingerprint(
+            'SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = \'a\''
+        )
+        second = slow_queries.fingerprint(
+            "SELECT *  FROM t\nWHERE id IN (1) AND name = 'it''s'"
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first, 'SELECT * FROM t WHERE id IN (?+) AND name = ?'
+        )
+
+    def test_strings_are_redacted(self):
+        """Строки скрываются, числа и None остаются"""
+        self.assertEqual(
+            slow_queries.redact(['user@example.com', 5, None, b'x']),
+            [slow_queries.REDACTED, 5, None, slow_queries.REDACTED],
+        )
+
+
+class IsolatedFilesTest(SimpleTestCase):
+    def test_log_outside_deployment(self):
+        """Медленные запросы тестов не пишутся в журнал деплоя"""
+        deployment = os.path.join(
+            tempfile.gettempdir(), settings.DEPLOYMENT_NAME
+        )
+        self.assertFalse(slow_queries.log_path().startswith(deployment))
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        logged = override_settings(
+            SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.path
+        )
+        logged.enable()
+        self.addCleanup(logged.disable)
+
+    def entries(self):
+        slow_queries.drain()
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_view_query_is_logged(self):
+        """Запрос представления пишется с местом в views.py и планом"""
+        Client().get(reverse('posts:profile', args=['Author']))
+        entries = [
+            entry for entry in self.entries()
+            if entry['view'] == 'posts:profile'
+            and re.match(r'posts/views\.py:\d+ in profile$', entry['frame'])
+        ]
+        self.assertTrue(entries)
+        entry = entries[0]
+        self.assertEqual(entry['params'][0], slow_queries.REDACTED)
+        self.assertTrue(entry['plan'])
+        self.assertEqual(len(entry['fingerprint']), 12)
+
+    def test_query_outside_views_is_logged(self):
+        """Запрос не из views.py пишется с местом вызова, а не обертки"""
+        Post.objects.count()
+        frames = [entry['frame'] for entry in self.entries()]
+        self.assertEqual(len(frames), 1)
+        self.assertRegex(
+            frames[0],
+            r'^core/tests/test_slow_queries\.py:\d+ '
+            r'in test_query_outside_views_is_logged$',
+        )
+
+    def test_template_node_is_logged(self):
+        """Запрос из шаблона пишется с местом в шаблоне"""
+        Template('\n{{ posts.count }}').render(
+            Context({'posts': Post.objects.all()})
+        )
+        templates = [entry['template'] for entry in self.entries()]
+        self.assertIn('<unknown source>:2', templates)
+
+    def test_fast_queries_are_skipped(self):
+        """Запросы быстрее порога не пишутся"""
+        with self.settings(SLOW_QUERY_MS=60_000):
+            Post.objects.count()
+        self.assertEqual(self.entries(), [])
+
+
+class SlowQueryReportTest(SimpleTestCase):
+    def test_worst_fingerprint_first(self):
+        """Запросы складываются по отпечатку, худший — первым"""
+        lines = [
+            {'sql': 'SELECT a FROM t WHERE id = %s', 'ms': 150, 'view': 'v1'},
+            {'sql': 'SELECT a FROM t WHERE id = %s', 'ms': 250, 'view': 'v1',
+             'frame': 'posts/views.py:10 in index'},
+            {'sql': 'SELECT b FROM t', 'ms': 300, 'view': 'v2'},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as log:
+            log.write('\n'.join(json.dumps(line) for line in lines))
+            log.write('\n{"недописанная')
+            log.flush()
+            out = StringIO()
+            call_command('slow_query_report', log=log.name, stdout=out)
+        text = out.getvalue()
+        self.assertIn('2 раз  всего 400.0 мс', text)
+        self.assertLess(
+            text.index('SELECT a FROM t WHERE id = ?'),
+            text.index('SELECT b FROM t'),
+        )
+        self.assertIn('posts/views.py:10 in index (1)', text)
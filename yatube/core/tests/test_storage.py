@@ -0,0 +1,84 @@
+# Тесты хранилища, адресуемого по содержимому
+# core/tests/test_storage.py
+import hashlib
+import os
+import shutil
+import tempfile
+
+from core.storage import ContentAddressedStorage
+from core.views import serve_media
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, SimpleTestCase
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_name_is_content_hash(self):
+        """Имя — sha256 содержимого в подкаталогах по его началу"""
+        content = b'picture' * 10000
+        name = self.storage.save('posts/cat.JPG', ContentFile(content))
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(
+            name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), content)
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые загрузки дают один файл, разные — разные"""
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/c.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        files = [
+            name for _, _, names in os.walk(self.storage.path('posts'))
+            for name in names
+        ]
+        self.assertEqual(len(files), 2)
+        self.assertEqual(os.listdir(self.storage.path('.incoming')), [])
+
+    def test_upload_refreshes_existing_file(self):
+        """Повторная загрузка продлевает файлу жизнь и чинит удаленный"""
+        name = self.storage.save('posts/a.gif', ContentFile(b'picture'))
+        path = self.storage.path(name)
+        os.utime(path, (0, 0))
+        with self.storage.exclusive(name) as touched:
+            self.assertEqual(touched, 0)
+        self.storage.save('posts/b.gif', ContentFile(b'picture'))
+        with self.storage.exclusive(name) as touched:
+            self.assertGreater(touched, 0)
+            os.unlink(path)
+        self.storage.save('posts/c.gif', ContentFile(b'picture'))
+        self.assertTrue(self.storage.exists(name))
+        with self.storage.exclusive('posts/missing.gif') as touched:
+            self.assertIsNone(touched)
+
+    def test_adopt_existing_file(self):
+        """Старый файл переезжает под имя из хэша жесткой ссылкой"""
+        os.makedirs(self.storage.path('posts'))
+        with open(self.storage.path('posts/cat.gif'), 'wb') as legacy:
+            legacy.write(b'gif')
+        name = self.storage.adopt('posts/cat.gif', 'posts')
+        digest = hashlib.sha256(b'gif').hexdigest()
+        self.assertTrue(name.endswith(f'/{digest}.gif'))
+        self.assertTrue(os.path.samefile(
+            self.storage.path(name), self.storage.path('posts/cat.gif')
+        ))
+
+    def test_hashed_media_is_immutable(self):
+        """Хэшированные имена отдаются с Cache-Control: immutable"""
+        hashed = self.storage.save('posts/a.gif', ContentFile(b'gif'))
+        self.storage.save('legacy.gif', ContentFile(b'gif'))
+        shutil.copy(self.storage.path(hashed), self.storage.path('plain.gif'))
+        request = RequestFactory().get('/media/')
+        response = serve_media(request, hashed, document_root=self.dir)
+        self.assertIn('immutable', response['Cache-Control'])
+        response = serve_media(request, 'plain.gif', document_root=self.dir)
+        self.assertFalse(response.has_header('Cache-Control'))
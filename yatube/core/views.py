@@ -1,5 +1,12 @@
 # core/views.py
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.views.static import serve
+
+from . import metrics, profiling
+from .storage import media_cache_control
 
 
 def page_not_found(request, exception):
@@ -12,3 +19,55 @@ def csrf_failure(request, reason=''):
 
 def server_error(request, reason=''):
     return render(request, 'core/500.html')
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """Отладочная раздача медиа; хэшированные имена кэшируются навсегда."""
+    response = serve(request, path, document_root, show_indexes)
+    cache_control = media_cache_control(path)
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+@staff_member_required
+def metrics_view(request):
+    """Счетчики представлений всех воркеров для Prometheus."""
+    return HttpResponse(
+        metrics.exposition(metrics.collect()),
+        content_type=metrics.CONTENT_TYPE,
+    )
+
+
+@staff_member_required
+def profiles_view(request):
+    """Последние профили запросов, с отбором по представлению."""
+    profiles = profiling.recent()
+    views = sorted({profile['view'] for profile in profiles})
+    selected = request.GET.get('view', '')
+    if selected:
+        profiles = [
+            profile for profile in profiles if profile['view'] == selected
+        ]
+    order = request.GET.get('o', '')
+    if order == 'ms':
+        profiles.sort(key=lambda profile: profile['ms'], reverse=True)
+    return render(request, 'core/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Профили запросов',
+        'profiles': profiles,
+        'views': views,
+        'selected': selected,
+        'order': order,
+        'token': profiling.token(request.user),
+    })
+
+
+@staff_member_required
+def profile_file(request, name, kind):
+    path = profiling.file_path(name, f'.{kind}')
+    if path is None:
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True, filename=f'{name}.{kind}'
+    )
@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db import connection
+from django.db.models.expressions import RawSQL
 
 from .models import Comment, Follow, Group, Post
+from .search import matching_ids_sql
 from .settings import EMPTY_VALUE_DISPLAY
 
 
@@ -18,6 +21,16 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = EMPTY_VALUE_DISPLAY
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE '%...%'
+        if not search_term or connection.vendor != 'sqlite':
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(
+            pk__in=RawSQL(*matching_ids_sql(search_term))
+        ), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
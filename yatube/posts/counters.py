@@ -0,0 +1,107 @@
+# posts/counters.py
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Group, MediaFile, Post, UserStats
+
+
+def bump(model, pk, **deltas):
+    """Атомарно сдвигает счетчики строки: UPDATE ... SET x = x + d.
+
+    Возвращает число обновленных строк. Счетчик не уходит ниже нуля,
+    даже если он успел разойтись с данными до сверки.
+    """
+    return model.objects.filter(pk=pk).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def bump_user(user_id, **deltas):
+    """Строки счетчиков еще нет — создаем ее пересчетом.
+
+    На уменьшении строку не создаем: это может быть каскадное
+    удаление самого пользователя.
+    """
+    updated = bump(UserStats, user_id, **deltas)
+    if not updated and max(deltas.values()) > 0:
+        recount_users([user_id])
+
+
+def bump_media(name, delta):
+    """Ссылки постов на файл; строка файла создается при первой."""
+    if delta > 0:
+        MediaFile.objects.get_or_create(name=name)
+    bump(MediaFile, name, refs=delta)
+
+
+def user_stats(user):
+    """Счетчики пользователя; недостающая строка пересчитывается."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users([user.pk])
+        return UserStats.objects.get(pk=user.pk)
+
+
+def _counts(queryset, field):
+    rows = queryset.order_by().values(field).annotate(n=Count('pk'))
+    return dict(rows.values_list(field, 'n'))
+
+
+def recount_users(ids):
+    ids = list(ids)
+    posts = _counts(Post.objects.filter(author_id__in=ids), 'author_id')
+    followers = _counts(Follow.objects.filter(author_id__in=ids), 'author_id')
+    following = _counts(Follow.objects.filter(user_id__in=ids), 'user_id')
+    stats = [
+        UserStats(
+            user_id=pk,
+            posts_count=posts.get(pk, 0),
+            followers_count=followers.get(pk, 0),
+            following_count=following.get(pk, 0),
+        )
+        for pk in ids
+    ]
+    existing = set(
+        UserStats.objects.filter(pk__in=ids).values_list('pk', flat=True)
+    )
+    UserStats.objects.bulk_create(
+        [row for row in stats if row.pk not in existing],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.bulk_update(
+        [row for row in stats if row.pk in existing],
+        ('posts_count', 'followers_count', 'following_count'),
+    )
+
+
+def recount_groups(ids):
+    ids = list(ids)
+    posts = _counts(Post.objects.filter(group_id__in=ids), 'group_id')
+    Group.objects.bulk_update(
+        [Group(pk=pk, posts_count=posts.get(pk, 0)) for pk in ids],
+        ('posts_count',),
+    )
+
+
+def recount_posts(ids):
+    ids = list(ids)
+    comments = _counts(Comment.objects.filter(post_id__in=ids), 'post_id')
+    Post.objects.bulk_update(
+        [Post(pk=pk, comments_count=comments.get(pk, 0)) for pk in ids],
+        ('comments_count',),
+    )
+
+
+def recount_media(names):
+    names = list(names)
+    refs = _counts(Post.objects.filter(image__in=names), 'image')
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name) for name in names],
+        ignore_conflicts=True,
+    )
+    MediaFile.objects.bulk_update(
+        [MediaFile(name=name, refs=refs.get(name, 0)) for name in names],
+        ('refs',),
+    )
@@ -0,0 +1,194 @@
+# posts/follow_graph.py
+"""Граф подписок в общем кэше: кто на кого подписан, без запросов.
+
+Множества id хранятся по-roaring: id делится на старшую часть
+(id >> 16) и младшую. На каждую старшую часть — свой ключ кэша:
+отсортированный array('H') младших частей или, если их больше
+ARRAY_LIMIT, битовая карта на 8 КБ. Так любой кусок влезает в слот
+кэша, даже у автора с сотнями тысяч подписчиков. Отдельный ключ
+хранит число id в каждом куске: по нему видно, какие куски есть.
+
+Запись в Follow сбрасывает заголовок и кусок (сигналы); без заголовка
+множество перечитывается целиком одним запросом по покрывающему
+индексу. Кусок, вытесненный из кэша сам по себе, перечитывается
+диапазоном id.
+"""
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+from .settings import FOLLOW_GRAPH_TIMEOUT
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+# кто владелец множества и чьи id в нем лежат
+FIELDS = {
+    FOLLOWING: ('user_id', 'author_id'),
+    FOLLOWERS: ('author_id', 'user_id'),
+}
+SHIFT = 16
+LOW = (1 << SHIFT) - 1
+# больше стольких id битовая карта (8 КБ) меньше массива
+ARRAY_LIMIT = 4096
+BITMAP_SIZE = (1 << SHIFT) // 8
+
+
+def _header_key(kind, owner):
+    return f'follow_graph:{kind}:{owner}'
+
+
+def _chunk_key(kind, owner, high):
+    return f'follow_graph:{kind}:{owner}:{high}'
+
+
+def _pack(lows):
+    if len(lows) <= ARRAY_LIMIT:
+        return array('H', lows)
+    bitmap = bytearray(BITMAP_SIZE)
+    for low in lows:
+        bitmap[low >> 3] |= 1 << (low & 7)
+    return bytes(bitmap)
+
+
+def _contains(chunk, low):
+    if isinstance(chunk, bytes):
+        return bool(chunk[low >> 3] >> (low & 7) & 1)
+    index = bisect_left(chunk, low)
+    return index < len(chunk) and chunk[index] == low
+
+
+def _lows(chunk):
+    if not isinstance(chunk, bytes):
+        return list(chunk)
+    return [
+        index * 8 + bit
+        for index, byte in enumerate(chunk) if byte
+        for bit in range(8) if byte >> bit & 1
+    ]
+
+
+def _query(kind, owner):
+    # сортировка в SQL стоила бы B-дерева, если планировщик возьмет
+    # индекс по одному владельцу; id сортируются в Python
+    owner_field, member_field = FIELDS[kind]
+    queryset = Follow.objects.filter(**{owner_field: owner}).order_by()
+    return queryset.values_list(member_field, flat=True)
+
+
+def _load(kind, owner):
+    """Все множество одним запросом по индексу: заголовок и куски."""
+    header, chunks = {}, {}
+    ids = sorted(_query(kind, owner))
+    for high, group in groupby(ids, lambda pk: pk >> SHIFT):
+        lows = [pk & LOW for pk in group]
+        header[high] = len(lows)
+        chunks[high] = _pack(lows)
+    cache.set_many({
+        _header_key(kind, owner): header,
+        **{
+            _chunk_key(kind, owner, high): chunk
+            for high, chunk in chunks.items()
+        },
+    }, FOLLOW_GRAPH_TIMEOUT)
+    return header, chunks
+
+
+def _load_chunk(kind, owner, high):
+    _, member_field = FIELDS[kind]
+    return _pack(sorted(
+        pk & LOW for pk in _query(kind, owner).filter(**{
+            f'{member_field}__gte': high << SHIFT,
+            f'{member_field}__lt': (high + 1) << SHIFT,
+        })
+    ))
+
+
+def _header(kind, owner):
+    """{старшая часть: сколько в ней id} и куски, если читались."""
+    header = cache.get(_header_key(kind, owner))
+    if header is None:
+        return _load(kind, owner)
+    return header, None
+
+
+def _chunks(kind, owner, highs=None):
+    """Куски множества по старшим частям; пустых в ответе нет.
+
+    Вытесненный кусок перечитывается диапазоном id, а не целиком.
+    """
+    header, chunks = _header(kind, owner)
+    if highs is None:
+        highs = header
+    if chunks is not None:
+        return {high: chunks[high] for high in highs if high in chunks}
+    keys = {
+        _chunk_key(kind, owner, high): high
+        for high in highs if header.get(high)
+    }
+    found = {keys[key]: chunk for key, chunk in cache.get_many(keys).items()}
+    missing = {
+        high: _load_chunk(kind, owner, high)
+        for high in keys.values() if high not in found
+    }
+    if missing:
+        cache.set_many({
+            _chunk_key(kind, owner, high): chunk
+            for high, chunk in missing.items()
+        }, FOLLOW_GRAPH_TIMEOUT)
+        found.update(missing)
+    return found
+
+
+def _members(kind, owner):
+    chunks = _chunks(kind, owner)
+    return [
+        high << SHIFT | low
+        for high in sorted(chunks) for low in _lows(chunks[high])
+    ]
+
+
+def followed_among(user_id, author_ids):
+    """Те из author_ids, на кого подписан user_id, — за один get_many."""
+    author_ids = set(author_ids)
+    chunks = _chunks(FOLLOWING, user_id, {pk >> SHIFT for pk in author_ids})
+    return {
+        pk for pk in author_ids
+        if pk >> SHIFT in chunks and _contains(chunks[pk >> SHIFT], pk & LOW)
+    }
+
+
+def is_following(user_id, author_id):
+    return bool(followed_among(user_id, (author_id,)))
+
+
+def following(user_id):
+    """id авторов, на которых подписан пользователь, по возрастанию."""
+    return _members(FOLLOWING, user_id)
+
+
+def followers(author_id):
+    """id подписчиков автора, по возрастанию."""
+    return _members(FOLLOWERS, author_id)
+
+
+def _forget(user_id, author_id):
+    cache.delete_many((
+        _header_key(FOLLOWING, user_id),
+        _chunk_key(FOLLOWING, user_id, author_id >> SHIFT),
+        _header_key(FOLLOWERS, author_id),
+        _chunk_key(FOLLOWERS, author_id, user_id >> SHIFT),
+    ))
+
+
+def changed(user_id, author_id):
+    """Зовется сигналами Follow: куски с этой парой перечитаются.
+
+    Сброс повторяется после коммита: иначе параллельный запрос мог бы
+    успеть закэшировать состояние до него.
+    """
+    _forget(user_id, author_id)
+    transaction.on_commit(lambda: _forget(user_id, author_id))
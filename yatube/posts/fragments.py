@@ -0,0 +1,71 @@
+# posts/fragments.py
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .settings import FEED_CACHE_TIMEOUT
+
+GENERATION_KEY = 'feed_generation:{}'
+ALL_FEEDS = 'all'
+
+
+def _fresh():
+    # Стартовое значение из часов: если ключ поколения вытеснят,
+    # новое поколение не совпадет ни с одним из старых.
+    return time.time_ns()
+
+
+def generations(feeds):
+    """Текущие поколения лент одним get_many."""
+    keys = {GENERATION_KEY.format(feed): feed for feed in feeds}
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh(), None)
+            found[key] = cache.get(key)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def _bump(feeds):
+    for feed in feeds:
+        key = GENERATION_KEY.format(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh(), None)
+
+
+def bump(*feeds):
+    """Новое поколение: закэшированные фрагменты лент больше не читаются.
+
+    Сдвиг повторяется после коммита: иначе параллельный запрос мог бы
+    закэшировать старые данные уже под новым поколением.
+    """
+    _bump(feeds)
+    transaction.on_commit(lambda: _bump(feeds))
+
+
+def post_feeds(author_id, *group_ids):
+    """Ленты, в которых показывается пост."""
+    feeds = ['index', f'profile:{author_id}']
+    feeds += [f'group:{group_id}' for group_id in group_ids if group_id]
+    return feeds
+
+
+def feed_cache(request, feed):
+    """Контекст для {% cache %} ленты: время жизни, версия и страница.
+
+    Версия складывается из поколения самой ленты и общего поколения,
+    которое сдвигается при изменении групп.
+    """
+    versions = generations((ALL_FEEDS, feed))
+    return {
+        'feed_timeout': FEED_CACHE_TIMEOUT,
+        'feed_version': '|'.join(
+            f'{name}.{value}' for name, value in sorted(versions.items())
+        ),
+        'feed_page': '{}:{}'.format(
+            request.GET.get('after', ''), request.GET.get('before', '')
+        ),
+    }
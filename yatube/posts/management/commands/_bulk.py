@@ -0,0 +1,14 @@
+from itertools import islice
+
+# Объектов в памяти за раз; размер INSERT Django подбирает сам
+CHUNK = 20_000
+
+
+def bulk_create(model, objects, **kwargs):
+    """bulk_create для генератора: в памяти не больше CHUNK объектов."""
+    objects = iter(objects)
+    while True:
+        chunk = list(islice(objects, CHUNK))
+        if not chunk:
+            return
+        model.objects.bulk_create(chunk, **kwargs)
@@ -0,0 +1,91 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts import pull_feed
+from posts.models import Follow, Post, User
+from posts.settings import NUMBER_OF_POSTS
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает первую страницу ленты подписок: запрос Post ⋈ Follow '
+        'и слияние закэшированных списков авторов. Данные создаются '
+        'во временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--authors', type=int, nargs='+', default=[10, 100, 1000]
+        )
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def timed(self, func, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def seed(self, reader, count, posts_per_author):
+        prefix = f'bench_{reader.pk}_'
+        User.objects.bulk_create(
+            User(username=f'{prefix}{i}') for i in range(count)
+        )
+        authors = User.objects.filter(username__startswith=prefix)
+        author_ids = list(authors.values_list('id', flat=True))
+        Post.objects.bulk_create(
+            (
+                Post(text='bench', author_id=author_id)
+                for author_id in author_ids
+                for _ in range(posts_per_author)
+            ),
+            batch_size=500,
+        )
+        Follow.objects.bulk_create(
+            Follow(user=reader, author_id=author_id)
+            for author_id in author_ids
+        )
+        return author_ids
+
+    def handle(self, *args, **options):
+        limit = NUMBER_OF_POSTS + 1
+        self.stdout.write('authors   orm, ms   pull cold, ms   pull warm, ms')
+        for count in options['authors']:
+            with transaction.atomic():
+                reader = User.objects.create(username=f'bench_reader_{count}')
+                author_ids = self.seed(
+                    reader, count, options['posts_per_author']
+                )
+
+                def orm():
+                    list(Post.objects.filter(
+                        author__following__user=reader
+                    )[:limit])
+
+                def pull():
+                    pull_feed.PullPaginator(
+                        author_ids, NUMBER_OF_POSTS
+                    ).get_page()
+
+                def pull_cold():
+                    cache.delete_many([
+                        pull_feed.AUTHOR_FEED_KEY.format(author_id)
+                        for author_id in author_ids
+                    ])
+                    pull()
+
+                orm_ms = self.timed(orm, options['repeat'])
+                cold_ms = self.timed(pull_cold, max(1, options['repeat'] // 5))
+                pull()
+                warm_ms = self.timed(pull, options['repeat'])
+                transaction.set_rollback(True)
+            cache.delete_many(
+                [pull_feed.AUTHOR_FEED_KEY.format(a) for a in author_ids]
+            )
+            self.stdout.write(
+                f'{count:>7} {orm_ms:>9.2f} {cold_ms:>15.2f} {warm_ms:>15.2f}'
+            )
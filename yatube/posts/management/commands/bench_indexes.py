@@ -0,0 +1,189 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from posts import search
+from posts.management.commands._bulk import bulk_create
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.settings import COMMENTS_PER_PAGE, NUMBER_OF_POSTS
+
+INDEXES = (
+    'post_date_idx',
+    'post_author_date_idx',
+    'post_group_date_idx',
+    'comment_post_created_idx',
+    'follow_author_user_idx',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Планы и время запросов лент с составными индексами и без них '
+        'на сгенерированных данных (только SQLite). Данные создаются '
+        'во временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--follows', type=int, default=50_000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        bulk_create(
+            User,
+            (
+                User(username=f'bench_idx_{i}')
+                for i in range(options['authors'])
+            ),
+        )
+        users = list(
+            User.objects.filter(
+                username__startswith='bench_idx_'
+            ).values_list('id', flat=True)
+        )
+        bulk_create(
+            Group,
+            (
+                Group(title=f'bench {i}', slug=f'bench-idx-{i}')
+                for i in range(options['groups'])
+            ),
+        )
+        groups = list(
+            Group.objects.filter(
+                slug__startswith='bench-idx-'
+            ).values_list('id', flat=True)
+        )
+        # Индекс поиска обновлялся бы на каждую строку; откат вернет
+        # триггер вместе со всем остальным.
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {search.FTS_TABLE}_ai')
+        start = timezone.now() - timedelta(minutes=options['posts'])
+        bulk_create(
+            Post,
+            (
+                Post(
+                    text='bench',
+                    author_id=rng.choice(users),
+                    group_id=rng.choice(groups) if rng.random() < 0.5
+                    else None,
+                )
+                for _ in range(options['posts'])
+            ),
+        )
+        # auto_now_add поставил всем одно время: разводим по минутам
+        first = Post.objects.filter(text='bench').order_by('id').first()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE posts_post SET pub_date = strftime("
+                "'%%Y-%%m-%%d %%H:%%M:%%f', %s, '+' || (id - %s) || "
+                "' minutes') WHERE id >= %s",
+                [start.strftime('%Y-%m-%d %H:%M:%S'), first.pk, first.pk],
+            )
+        hot = Post.objects.filter(pk__gte=first.pk).order_by('-id').first()
+        post_range = (first.pk, hot.pk)
+        bulk_create(
+            Comment,
+            (
+                Comment(
+                    post_id=hot.pk if i % 10 == 0
+                    else rng.randint(*post_range),
+                    author_id=rng.choice(users),
+                    text='bench',
+                )
+                for i in range(options['comments'])
+            ),
+        )
+        pairs = {
+            tuple(rng.sample(users, 2)) for _ in range(options['follows'])
+        }
+        bulk_create(
+            Follow,
+            (Follow(user_id=user, author_id=author) for user, author in pairs),
+        )
+        middle = Post.objects.filter(pk__gte=first.pk).order_by(
+            '-pub_date', '-id'
+        ).values_list('pub_date', 'id')[options['posts'] // 2]
+        return {
+            'author': rng.choice(users),
+            'group': rng.choice(groups),
+            'hot': hot.pk,
+            'middle': middle,
+            'follow': next(iter(pairs)),
+        }
+
+    def queries(self, data):
+        """Запросы тех же форм, что делают ленты, страница и подписка."""
+        date, pk = data['middle']
+        feed = Post.objects.order_by('-pub_date', '-id')
+        user, author = data['follow']
+        return (
+            ('index', feed[:NUMBER_OF_POSTS + 1]),
+            ('index, курсор', CursorPaginator(feed, NUMBER_OF_POSTS)._after(
+                (date, pk)
+            ).order_by('-pub_date', '-id')[:NUMBER_OF_POSTS + 1]),
+            ('profile', feed.filter(
+                author_id=data['author']
+            )[:NUMBER_OF_POSTS + 1]),
+            ('group', feed.filter(
+                group_id=data['group']
+            )[:NUMBER_OF_POSTS + 1]),
+            ('comments', Comment.objects.filter(
+                post_id=data['hot']
+            ).order_by('-created', '-id')[:COMMENTS_PER_PAGE + 1]),
+            ('follow', Follow.objects.filter(
+                author_id=author, user_id=user
+            )[:1]),
+        )
+
+    def plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return '; '.join(row[-1] for row in cursor.fetchall())
+
+    def timed(self, sql, params, repeat):
+        best = float('inf')
+        with connection.cursor() as cursor:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def measure(self, title, data, repeat):
+        self.stdout.write(f'\n{title}')
+        for name, queryset in self.queries(data):
+            sql, params = queryset.query.sql_with_params()
+            self.stdout.write(
+                f'{name:<15} {self.timed(sql, params, repeat):>9.2f} ms  '
+                f'{self.plan(sql, params)}'
+            )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Планы запросов снимаются только для SQLite')
+        with transaction.atomic():
+            started = time.perf_counter()
+            data = self.seed(options)
+            self.stdout.write(
+                f'Данные: {options["posts"]} постов, '
+                f'{time.perf_counter() - started:.0f} с'
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.measure('С индексами', data, options['repeat'])
+            with connection.cursor() as cursor:
+                for index in INDEXES:
+                    cursor.execute(f'DROP INDEX {index}')
+                cursor.execute('ANALYZE')
+            self.measure('Без индексов', data, options['repeat'])
+            transaction.set_rollback(True)
@@ -0,0 +1,272 @@
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from fnmatch import fnmatch
+
+from core.metrics import MetricsMiddleware
+from core.templatetags.user_filters import addclass
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Page, Paginator
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.template import Context, Template, defaultfilters
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Group, Post, TimelineEntry, User
+from posts.paginator import CursorPaginator
+from posts.settings import COMMENTS_PER_PAGE, NUMBER_OF_POSTS
+
+TEXT = (
+    'Первый абзац поста с парой предложений. Второе предложение.\n\n'
+    'Второй абзац,\nс переносом строки и <тегом>, который экранируется.'
+)
+# карточек на странице, как в ленте
+CARDS = NUMBER_OF_POSTS
+URLS = 100
+
+
+def sample_posts(count):
+    """Посты в памяти, без базы: замеряется только Python."""
+    author = User(pk=1, username='author', first_name='Лев')
+    group = Group(pk=1, title='Группа', slug='group')
+    date = timezone.make_aware(datetime(2024, 1, 1, 12, 0))
+    return [
+        Post(
+            pk=number, text=TEXT, author=author, group=group, pub_date=date
+        )
+        for number in range(1, count + 1)
+    ]
+
+
+def card():
+    """Одна карточка index.html: страница с CARDS постами минус пустая."""
+    template = get_template('posts/index.html')
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+
+    def page(posts):
+        page_obj = Page(posts, 1, Paginator(posts, max(len(posts), 1)))
+        page_obj.next_cursor = page_obj.previous_cursor = None
+        context = {
+            'page_obj': page_obj,
+            # нулевой срок: фрагмент рендерится каждый раз
+            'feed_timeout': 0,
+            'feed_version': 'bench',
+            'feed_page': '',
+        }
+        return lambda: template.render(context, request)
+
+    return page(sample_posts(CARDS)), CARDS, page([])
+
+
+def linebreaks():
+    return lambda: defaultfilters.linebreaks_filter(TEXT, True), 1, None
+
+
+def date():
+    value = sample_posts(1)[0].pub_date
+    return lambda: defaultfilters.date(value, 'd E Y'), 1, None
+
+
+def add_class():
+    field = PostForm()['text']
+    return lambda: addclass(field, 'form-control'), 1, None
+
+
+def url_loop():
+    """{% url %} в цикле, на один адрес."""
+    template = Template(
+        "{% for post in posts %}"
+        "{% url 'posts:post_detail' post.id %}{% endfor %}"
+    )
+    full = Context({'posts': sample_posts(URLS)})
+    empty = Context({'posts': []})
+    return (
+        lambda: template.render(full), URLS, lambda: template.render(empty)
+    )
+
+
+def post_form():
+    return lambda: PostForm({'text': TEXT}).is_valid(), 1, None
+
+
+def comment_form():
+    return lambda: CommentForm({'text': TEXT}).is_valid(), 1, None
+
+
+def metrics_middleware():
+    """Накладные расходы MetricsMiddleware на запрос."""
+    response = HttpResponse(b'x' * 10000)
+    request = RequestFactory().get('/')
+    request.resolver_match = resolve('/')
+    middleware = MetricsMiddleware(lambda request: response)
+    return lambda: middleware(request), 1, lambda: response
+
+
+def compiled(queryset):
+    """SQL страницы за курсором, без обращения к базе."""
+    field, per_page = queryset.date_field, queryset.per_page
+
+    def build():
+        paginator = CursorPaginator(queryset(), per_page, date_field=field)
+        rows = paginator._after((timezone.now(), 1000)).order_by(
+            f'-{field}', '-id'
+        )[:per_page + 1]
+        return rows.query.get_compiler(DEFAULT_DB_ALIAS).as_sql()
+    return build, 1, None
+
+
+def feed(date_field='pub_date', per_page=NUMBER_OF_POSTS):
+    def decorate(function):
+        function.date_field, function.per_page = date_field, per_page
+        return function
+    return decorate
+
+
+# Наборы запросов — такие же, как строят представления
+@feed()
+def index_queryset():
+    return Post.objects.select_related('author', 'group')
+
+
+@feed()
+def group_queryset():
+    return Group(pk=1).posts.select_related('author')
+
+
+@feed()
+def profile_queryset():
+    return Post.objects.filter(author=User(pk=1)).select_related('group')
+
+
+@feed('created', COMMENTS_PER_PAGE)
+def comments_queryset():
+    return Comment.objects.filter(post_id=1).select_related('author')
+
+
+@feed()
+def timeline_queryset():
+    return TimelineEntry.objects.filter(user_id=1).select_related(
+        'post__author', 'post__group'
+    )
+
+
+CASES = {
+    'index.html: карточка': card,
+    'filter: linebreaks': linebreaks,
+    'filter: date': date,
+    'filter: addclass': add_class,
+    'tag: url в цикле': url_loop,
+    'form: PostForm': post_form,
+    'form: CommentForm': comment_form,
+    'middleware: metrics': metrics_middleware,
+    'queryset: index': lambda: compiled(index_queryset),
+    'queryset: group_posts': lambda: compiled(group_queryset),
+    'queryset: profile': lambda: compiled(profile_queryset),
+    'queryset: post_detail': lambda: compiled(comments_queryset),
+    'queryset: follow_index': lambda: compiled(timeline_queryset),
+}
+
+
+def timed(func, number, repeat):
+    """Лучшее время одного вызова из repeat серий по number."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def allocations(func, number):
+    """Блоки, которые остаются у результата, и пик за один вызов.
+
+    Результаты держатся в списке, чтобы tracemalloc их видел, а
+    временные объекты внутри вызова попадают только в пик.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        before = tracemalloc.take_snapshot()
+        kept = [func() for _ in range(number)]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del kept
+    # пик одного вызова — в новом сеансе, он считает с нуля
+    # (tracemalloc.reset_peak() появился только в Python 3.9)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    return blocks / number, peak
+
+
+def measure(case, number, repeat):
+    func, items, base = CASES[case]()
+    seconds = timed(func, number, repeat)
+    blocks, peak = allocations(func, number)
+    if base is not None:
+        seconds -= timed(base, number, repeat)
+        base_blocks, base_peak = allocations(base, number)
+        blocks -= base_blocks
+        peak = max(peak - base_peak, 0)
+    return {
+        'case': case,
+        'us': round(seconds / items * 1e6, 2),
+        'kept_blocks': round(blocks / items, 1),
+        'peak_kb': round(peak / items / 1024, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Микробенчмарки: карточка поста, фильтры, {% url %}, формы и '
+        'построение запросов представлений. Время и выделения памяти '
+        '(tracemalloc) на один элемент.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cases', nargs='+', default=['*'])
+        parser.add_argument('--output', help='Файл для JSON')
+        parser.add_argument('--baseline', help='JSON прошлого прогона')
+
+    def handle(self, *args, **options):
+        results = [
+            measure(case, options['number'], options['repeat'])
+            for case in CASES
+            if any(fnmatch(case, mask) for mask in options['cases'])
+        ]
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = {row['case']: row for row in json.load(file)}
+        self.stdout.write(
+            f'{"":<26} {"мкс":>9} {"блоков":>8} {"пик, КБ":>9}'
+        )
+        for row in results:
+            line = (
+                f'{row["case"]:<26} {row["us"]:>9} '
+                f'{row["kept_blocks"]:>8} {row["peak_kb"]:>9}'
+            )
+            old = baseline.get(row['case'])
+            if old and old['us']:
+                line += f'  ({(row["us"] / old["us"] - 1) * 100:+.1f}%)'
+            self.stdout.write(line)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,99 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from posts.models import Post, User
+from posts.settings import NUMBER_OF_POSTS
+from sorl.thumbnail import default
+from sorl.thumbnail.images import serialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+FEED = (
+    '{% load thumbnail page_thumbnails %}{{ prime }}'
+    '{% for post in posts %}'
+    '{% thumbnail post.image "100x100" crop="center" as im %}'
+    '{{ im.url }}{% endthumbnail %}'
+    '{% endfor %}'
+)
+PRIME = '{% prime_thumbnails posts "100x100" crop="center" %}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает обращения к кэшу и базе за миниатюрами при отрисовке '
+        'страницы ленты: по одному на тег и одной пачкой. Данные '
+        'создаются во временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-page', type=int, default=NUMBER_OF_POSTS)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    @contextmanager
+    def counted(self):
+        """Число вызовов кэша KV и запросов к базе внутри блока."""
+        calls = Counter()
+        kv_cache = default.kvstore.cache
+        names = ('get', 'get_many', 'set', 'set_many')
+        for name in names:
+            def wrapper(*args, _method=getattr(kv_cache, name), **kwargs):
+                calls['cache'] += 1
+                return _method(*args, **kwargs)
+            setattr(kv_cache, name, wrapper)
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                yield calls
+        finally:
+            for name in names:
+                delattr(kv_cache, name)
+            calls['db'] = len(queries)
+
+    def seed(self, count):
+        """Посты с картинками и готовыми записями миниатюр в KV."""
+        author = User.objects.create(username='bench_thumbnails')
+        posts = [
+            Post.objects.create(
+                text='bench', author=author, image=f'posts/bench_{i}.jpg'
+            )
+            for i in range(count)
+        ]
+        keys = []
+        for post in posts:
+            thumbnail = default.backend._thumbnail_file(
+                post.image, '100x100', {'crop': 'center'}
+            )
+            thumbnail.set_size((100, 100))
+            key = add_prefix(thumbnail.key)
+            default.kvstore._set_raw(key, serialize_image_file(thumbnail))
+            keys.append(key)
+        return posts, keys
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            'kv        mode      cache calls   db queries   render, ms'
+        )
+        with transaction.atomic():
+            posts, keys = self.seed(options['per_page'])
+            for mode, prime in (('по тегу', ''), ('пачкой', PRIME)):
+                template = Template(FEED.replace('{{ prime }}', prime))
+                context = Context({'posts': posts})
+                for state in ('в базе', 'в кэше'):
+                    if state == 'в базе':
+                        default.kvstore.cache.delete_many(keys)
+                    with self.counted() as calls:
+                        template.render(context)
+                    best = float('inf')
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        template.render(context)
+                        best = min(best, time.perf_counter() - start)
+                    self.stdout.write(
+                        f'{state:<9} {mode:<9} {calls["cache"]:>11} '
+                        f'{calls["db"]:>12} {best * 1000:>12.2f}'
+                    )
+            transaction.set_rollback(True)
+        default.kvstore.cache.delete_many(keys)
@@ -0,0 +1,364 @@
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from fnmatch import fnmatch
+
+from about import urls as about_urls
+from core.cache import isolated_caches
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from posts import urls as posts_urls
+from posts.models import Follow, Group, Post, User
+from users import urls as users_urls
+
+URLCONFS = (posts_urls, users_urls, about_urls)
+VARIANTS = ('anonymous', 'user')
+# Маршруты, которые меняют состояние: перед замером или после него
+# состояние возвращается запросом, который в замер не входит.
+RESET_AFTER = {'posts:profile_follow': 'posts:profile_unfollow'}
+RESET_BEFORE = {'posts:profile_unfollow': 'posts:profile_follow'}
+RELOGIN_AFTER = {'users:logout'}
+FOLLOW_ROUTES = ('posts:profile_follow', 'posts:profile_unfollow')
+# SQLite пускает одного писателя: пишущие маршруты в несколько
+# процессов мерили бы ожидание блокировки, а не сами страницы.
+WRITE_ROUTES = FOLLOW_ROUTES
+# метрики, по которым сравнивается с базовым прогоном
+COMPARED = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes')
+
+# состояние процесса-исполнителя
+_worker = {}
+
+
+def routes():
+    for urlconf in URLCONFS:
+        for pattern in urlconf.urlpatterns:
+            yield f'{urlconf.app_name}:{pattern.name}', tuple(
+                pattern.pattern.converters
+            )
+
+
+def samples(readers):
+    """Объекты, на которых гоняются маршруты с параметрами.
+
+    Берутся самые нагруженные: пост с наибольшим числом комментариев,
+    самая большая группа, самый плодовитый автор. Каждому процессу
+    свой читатель, чтобы подписки не мешали друг другу.
+    """
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    if post is None:
+        raise CommandError('В базе нет постов: сначала seed_dataset')
+    group = Group.objects.order_by('-posts_count').first()
+    author = User.objects.annotate(n=Count('posts')).order_by('-n').first()
+    users = list(User.objects.annotate(n=Count('follower')).order_by(
+        '-n', 'pk'
+    ).values_list('pk', flat=True)[:readers])
+    word = post.text.split()[0] if post.text.split() else 'a'
+    return {
+        'post_id': post.pk,
+        'slug': group.slug if group else 'missing',
+        'username': author.username,
+        'query': word.strip('.,!?'),
+        'readers': [reader(pk) for pk in users],
+    }
+
+
+def reader(user_id):
+    """Читатель, автор вне его подписок и его собственный пост."""
+    stranger = User.objects.exclude(pk=user_id).exclude(
+        pk__in=Follow.objects.filter(user_id=user_id).values('author_id')
+    ).order_by('pk').values_list('username', flat=True).first()
+    own_post = Post.objects.filter(author_id=user_id).values_list(
+        'pk', flat=True
+    ).first()
+    return {'id': user_id, 'stranger': stranger, 'own_post': own_post}
+
+
+def url_for(route, params, data, user):
+    kwargs = {}
+    for param in params:
+        if param == 'post_id':
+            own = user and route == 'posts:post_edit' and user['own_post']
+            kwargs[param] = own or data['post_id']
+        elif param == 'username':
+            stranger = user and route in FOLLOW_ROUTES and user['stranger']
+            kwargs[param] = stranger or data['username']
+        else:
+            kwargs[param] = data[param]
+    url = reverse(route, kwargs=kwargs)
+    if route == 'posts:search':
+        url += f'?q={data["query"]}'
+    return url
+
+
+def percentile(values, share):
+    """Процентиль с линейной интерполяцией.
+
+    То же, что statistics.quantiles(method='inclusive'), которого нет
+    до Python 3.8.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * share / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _init_worker(data):
+    # после fork у процесса должны быть свои соединения с базой
+    connections.close_all()
+    _worker['data'] = data
+
+
+def _client(data, variant, index):
+    """Клиент варианта: аноним или свой для процесса читатель."""
+    client = Client()
+    if variant != 'user':
+        return client, None
+    user = data['readers'][index % len(data['readers'])]
+    client.force_login(User.objects.get(pk=user['id']))
+    return client, user
+
+
+def _reset_urls(route, params, data, user):
+    """Запросы до и после замера, которые возвращают состояние."""
+    before, after = RESET_BEFORE.get(route), RESET_AFTER.get(route)
+    return (
+        before and url_for(before, params, data, user),
+        after and url_for(after, params, data, user),
+    )
+
+
+def _get(client, path):
+    try:
+        return client.get(path)
+    except Exception:
+        return None
+
+
+def _timed_get(client, url):
+    """Замеренный запрос: секунды, число SQL-запросов и ответ."""
+    queries = [0]
+
+    def counted(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counted):
+        start = time.perf_counter()
+        response = _get(client, url)
+        elapsed = time.perf_counter() - start
+    return elapsed, queries[0], response
+
+
+def _add_sample(result, elapsed, queries, response):
+    result['latency'].append(elapsed * 1000)
+    result['queries'].append(queries)
+    if response is None:
+        result['bytes'].append(0)
+        result['status'].append(500)
+    else:
+        result['bytes'].append(len(response.content))
+        result['status'].append(response.status_code)
+
+
+def _run(job):
+    """Один процесс, один маршрут в одном варианте: count запросов."""
+    route, params, variant, cold, count, index = job
+    data = _worker['data']
+    client, user = _client(data, variant, index)
+    url = url_for(route, params, data, user)
+    before, after = _reset_urls(route, params, data, user)
+
+    def once():
+        if before:
+            _get(client, before)
+        if cold:
+            cache.clear()
+        sample = _timed_get(client, url)
+        if after:
+            _get(client, after)
+        if route in RELOGIN_AFTER and user:
+            client.force_login(User.objects.get(pk=user['id']))
+        return sample
+
+    if not cold:
+        once()
+    result = {'latency': [], 'queries': [], 'bytes': [], 'status': []}
+    for _ in range(count):
+        _add_sample(result, *once())
+    return result
+
+
+def summarize(route, variant, cold, url, results, wall):
+    latency = sorted(value for r in results for value in r['latency'])
+    total = len(latency)
+    return {
+        'route': route,
+        'url': url,
+        'user': variant,
+        'cache': 'cold' if cold else 'warm',
+        'requests': total,
+        'mean_ms': round(statistics.mean(latency), 3),
+        'p50_ms': round(percentile(latency, 50), 3),
+        'p95_ms': round(percentile(latency, 95), 3),
+        'p99_ms': round(percentile(latency, 99), 3),
+        'throughput_rps': round(total / wall, 1),
+        'queries': round(statistics.mean(
+            value for r in results for value in r['queries']
+        ), 2),
+        'bytes': round(statistics.mean(
+            value for r in results for value in r['bytes']
+        )),
+        'status': dict(Counter(
+            str(value) for r in results for value in r['status']
+        )),
+    }
+
+
+def compare(baseline, current):
+    """Строки «маршрут, вариант, метрика: было → стало (разница %)»."""
+    def key(row):
+        return row['route'], row['user'], row['cache']
+
+    before = {key(row): row for row in baseline['results']}
+    lines = []
+    for row in current['results']:
+        old = before.get(key(row))
+        if old is None:
+            continue
+        for metric in COMPARED:
+            was, now = old[metric], row[metric]
+            delta = (now - was) / was * 100 if was else 0.0
+            lines.append(
+                f'{row["route"]:<26} {row["user"]:<9} {row["cache"]:<4} '
+                f'{metric:<8} {was:>10} → {now:>10} ({delta:+.1f}%)'
+            )
+    return lines
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=settings.BASE_DIR, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Задержки всех маршрутов posts, users и about в процессе, '
+        'параллельно в нескольких процессах: аноним и вошедший '
+        'пользователь, холодный и теплый кэш. Результат — JSON для '
+        'сравнения с сохраненным базовым прогоном. Данные берутся из '
+        'текущей базы, например после seed_dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1
+        )
+        parser.add_argument(
+            '--routes', nargs='+', default=['*'],
+            help='Шаблоны имен маршрутов, например posts:*',
+        )
+        parser.add_argument('--output', help='Файл для JSON, иначе stdout')
+        parser.add_argument('--baseline', help='JSON прошлого прогона')
+
+    def measure(self, pool, route, params, variant, cold, options, data):
+        workers = max(1, options['processes'])
+        if route in WRITE_ROUTES and connection.vendor == 'sqlite':
+            workers = 1
+        count = max(1, options['requests'] // workers)
+        jobs = [
+            (route, params, variant, cold, count, index)
+            for index in range(workers)
+        ]
+        start = time.perf_counter()
+        if pool is None:
+            done = [_run(job) for job in jobs]
+        else:
+            done = pool.map(_run, jobs)
+        wall = time.perf_counter() - start
+        user = data['readers'][0] if variant == 'user' else None
+        row = summarize(
+            route, variant, cold, url_for(route, params, data, user),
+            done, wall,
+        )
+        row['processes'] = workers
+        return row
+
+    def handle(self, *args, **options):
+        # Холодный кэш — это cache.clear() перед запросом: замер идет
+        # на своих файлах кэша, кэш деплоя остается нетронутым.
+        directory = tempfile.mkdtemp(prefix='bench-urls-cache-')
+        try:
+            with override_settings(CACHES=isolated_caches(directory)):
+                report = self.bench(options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(text)
+        else:
+            self.stdout.write(text)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            for line in compare(baseline, report):
+                self.stderr.write(line)
+
+    def bench(self, options):
+        processes = max(1, options['processes'])
+        data = samples(processes)
+        selected = [
+            (route, params) for route, params in routes()
+            if any(fnmatch(route, mask) for mask in options['routes'])
+        ]
+        pool = None
+        if processes > 1:
+            pool = multiprocessing.get_context('fork').Pool(
+                processes, _init_worker, (data,)
+            )
+        else:
+            _worker['data'] = data
+        results = []
+        try:
+            for route, params in selected:
+                for variant in VARIANTS:
+                    for cold in (True, False):
+                        results.append(self.measure(
+                            pool, route, params, variant, cold, options, data
+                        ))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return {
+            'meta': {
+                'revision': revision(),
+                'python': sys.version.split()[0],
+                'processes': processes,
+                'requests': options['requests'],
+                'posts': Post.objects.count(),
+                'users': User.objects.count(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from posts import timeline
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписок по уже существующим подпискам'
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        count = 0
+        for user_id, author_id in follows.iterator():
+            timeline.backfill(user_id, author_id)
+            count += 1
+        self.stdout.write(f'Обработано подписок: {count}')
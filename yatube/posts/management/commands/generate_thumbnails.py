@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Делает недостающие миниатюры для уже загруженных картинок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        last_pk, done = 0, 0
+        while True:
+            ids = list(
+                posts.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True
+                )[:size]
+            )
+            if not ids:
+                break
+            for post_id in ids:
+                thumbnails.generate(post_id)
+            done += len(ids)
+            last_pk = ids[-1]
+        self.stdout.write(f'Обработано постов с картинками: {done}')
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from posts.search import FTS_TABLE
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов порциями по id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+            )
+        last_pk, done = 0, 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT id, text FROM posts_post WHERE id > %s '
+                    'ORDER BY id LIMIT %s',
+                    [last_pk, size],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (%s, %s)',
+                    rows,
+                )
+            last_pk = rows[-1][0]
+            done += len(rows)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+            )
+        self.stdout.write(f'Проиндексировано постов: {done}')
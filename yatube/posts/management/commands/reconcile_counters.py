@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts import counters, media
+from posts.models import Group, MediaFile, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счетчики с данными порциями по id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def chunks(self, queryset, size):
+        last_pk = 0
+        while True:
+            ids = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True
+                )[:size]
+            )
+            if not ids:
+                return
+            yield ids
+            last_pk = ids[-1]
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        jobs = (
+            ('пользователей', User.objects.all(), counters.recount_users),
+            ('групп', Group.objects.all(), counters.recount_groups),
+            ('постов', Post.objects.all(), counters.recount_posts),
+            ('файлов', MediaFile.objects.all(), counters.recount_media),
+        )
+        # файлы постов, для которых еще нет строки счетчика
+        unknown = list(
+            Post.objects.exclude(image='').exclude(
+                image__in=MediaFile.objects.values('name')
+            ).order_by().values_list('image', flat=True).distinct()
+        )
+        for start in range(0, len(unknown), size):
+            counters.recount_media(unknown[start:start + size])
+        for title, queryset, recount in jobs:
+            done = 0
+            for ids in self.chunks(queryset, size):
+                with transaction.atomic():
+                    recount(ids)
+                done += len(ids)
+            self.stdout.write(f'Сверено {title}: {done}')
+        orphans = list(
+            MediaFile.objects.filter(refs=0).values_list('name', flat=True)
+        )
+        for name in orphans:
+            media.collect(name)
+        self.stdout.write(f'Удалено файлов без ссылок: {len(orphans)}')
@@ -0,0 +1,259 @@
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+from posts import fragments, search, thumbnails, timeline
+from posts.management.commands._bulk import bulk_create
+from posts.middleware import PAGES
+from posts.models import Comment, Follow, Group, Post, User
+
+# Тексты берутся из заранее сгенерированного пула: Faker медленный
+TEXT_POOL = 2000
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Выключает auto_now_add: даты задает генератор."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def search_trigger_off():
+    """Индекс поиска строится разом в конце, а не триггером на строку."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {search.FTS_TABLE}_ai')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for sql in search.INSTALL_SQL:
+                cursor.execute(sql)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу воспроизводимым набором данных для нагрузочных '
+        'тестов: авторы постов распределены по степенному закону.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=300_000)
+        parser.add_argument('--follows', type=int, default=20_000)
+        parser.add_argument('--images', type=int, default=50)
+        parser.add_argument(
+            '--image-share', type=float, default=0.2,
+            help='Доля постов с картинкой',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.2,
+            help='Показатель степенного закона для авторов',
+        )
+        parser.add_argument(
+            '--until', default='2024-01-01',
+            help='Дата последнего поста, посты идут за год до нее',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        if User.objects.filter(username__endswith=f'_s{seed}_0').exists():
+            raise CommandError(
+                f'Данные с seed={seed} уже есть, нужен другой --seed'
+            )
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        until = timezone.make_aware(
+            datetime.fromisoformat(options['until']), timezone.utc
+        )
+        started = time.perf_counter()
+        with transaction.atomic(), search_trigger_off(), explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            users = self.users(options['users'], seed)
+            groups = self.groups(options['groups'], seed)
+            images = self.images(options['images'])
+            weights = list(accumulate(
+                1 / rank ** options['zipf']
+                for rank in range(1, len(users) + 1)
+            ))
+            post_at = self.posts(
+                options, users, weights, groups, images,
+                until - timedelta(days=365), timedelta(days=365),
+            )
+            self.comments(
+                options['comments'], users, post_at, options['posts']
+            )
+            self.follows(options['follows'], users, weights)
+        self.report('Данные', started)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+        if timeline.enabled():
+            call_command('fill_timeline', stdout=self.stdout)
+        for name in images:
+            post_id = Post.objects.filter(image=name).values_list(
+                'pk', flat=True
+            ).first()
+            if post_id is not None:
+                thumbnails.generate(post_id)
+        fragments.bump(PAGES, fragments.ALL_FEEDS)
+        self.report('Всего', started)
+
+    def report(self, title, started):
+        self.stdout.write(f'{title}: {time.perf_counter() - started:.1f} с')
+
+    def users(self, count, seed):
+        fake = self.fake
+        bulk_create(User, (
+            User(
+                username=f'{fake.user_name()}_s{seed}_{number}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                password='!',
+            )
+            for number in range(count)
+        ))
+        return list(
+            User.objects.filter(username__contains=f'_s{seed}_').order_by(
+                'pk'
+            ).values_list('pk', flat=True)
+        )
+
+    def groups(self, count, seed):
+        fake = self.fake
+        bulk_create(Group, (
+            Group(
+                title=fake.word().capitalize(),
+                slug=f'group-s{seed}-{number}',
+                description=fake.sentence(),
+            )
+            for number in range(count)
+        ))
+        return list(
+            Group.objects.filter(slug__startswith=f'group-s{seed}-').order_by(
+                'pk'
+            ).values_list('pk', flat=True)
+        )
+
+    def images(self, count):
+        """Картинки разного цвета; одинаковые при том же seed.
+
+        Хранилище адресует файлы по содержимому, поэтому повторный
+        запуск не плодит копии.
+        """
+        names = []
+        for _ in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            image = Image.new('RGB', (960, 540), color)
+            draw = ImageDraw.Draw(image)
+            for _ in range(3):
+                x, y = self.rng.randrange(800), self.rng.randrange(400)
+                fill = tuple(self.rng.randrange(256) for _ in range(3))
+                draw.ellipse((x, y, x + 160, y + 140), fill=fill)
+            content = io.BytesIO()
+            image.save(content, 'JPEG', quality=85)
+            names.append(default_storage.save(
+                'posts/seed.jpg', ContentFile(content.getvalue())
+            ))
+        return names
+
+    def posts(self, options, users, weights, groups, images, start, span):
+        """Посты по времени подряд, авторы — по закону Ципфа.
+
+        Возвращает функцию, которая по номеру поста дает его id и дату:
+        комментариям нужны оба, а держать в памяти все посты нельзя.
+        """
+        rng, count = self.rng, options['posts']
+        texts = [
+            self.fake.paragraph(nb_sentences=4) for _ in range(TEXT_POOL)
+        ]
+        step = span / max(count, 1)
+        last = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        started = time.perf_counter()
+
+        def generate():
+            for number in range(count):
+                yield Post(
+                    text=rng.choice(texts),
+                    author_id=rng.choices(users, cum_weights=weights)[0],
+                    group_id=(
+                        rng.choice(groups)
+                        if groups and rng.random() < 0.6 else None
+                    ),
+                    image=(
+                        rng.choice(images)
+                        if images and rng.random() < options['image_share']
+                        else ''
+                    ),
+                    pub_date=start + step * number,
+                )
+
+        bulk_create(Post, generate())
+        self.report(f'Постов {count}', started)
+        # В одной транзакции id идут подряд, но не обязательно с last + 1
+        first = Post.objects.filter(pk__gt=last).order_by('pk').values_list(
+            'pk', flat=True
+        ).first()
+        return lambda number: (first + number, start + step * number)
+
+    def comments(self, count, users, post_at, posts):
+        """Свежие посты комментируют чаще: номер поста смещен к концу."""
+        rng = self.rng
+        texts = [self.fake.sentence() for _ in range(TEXT_POOL)]
+        started = time.perf_counter()
+
+        def generate():
+            for _ in range(count):
+                post_id, pub_date = post_at(
+                    posts - 1 - int(posts * rng.random() ** 3)
+                )
+                yield Comment(
+                    post_id=post_id,
+                    author_id=rng.choice(users),
+                    text=rng.choice(texts),
+                    created=pub_date + timedelta(
+                        minutes=rng.randrange(1, 7 * 24 * 60)
+                    ),
+                )
+
+        if posts:
+            bulk_create(Comment, generate())
+        self.report(f'Комментариев {count}', started)
+
+    def follows(self, count, users, weights):
+        """На популярных авторов подписываются чаще."""
+        rng = self.rng
+        started = time.perf_counter()
+
+        def generate():
+            for _ in range(count):
+                user = rng.choice(users)
+                author = rng.choices(users, cum_weights=weights)[0]
+                if user != author:
+                    yield Follow(user_id=user, author_id=author)
+
+        bulk_create(Follow, generate(), ignore_conflicts=True)
+        self.report(f'Подписок до {count}', started)
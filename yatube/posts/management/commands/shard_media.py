@@ -0,0 +1,75 @@
+import os
+
+from core.storage import ContentAddressedStorage
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from posts import counters, fragments, media, thumbnails
+from posts.middleware import PAGES
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из плоского каталога upload_to '
+        'в подкаталоги по хэшу содержимого, порциями по id постов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def move(self, rows, directory):
+        """Одна порция: файлы связываются заранее, база — короткой транзакцией.
+
+        Строки обновляются по старому имени, так что пост, который
+        успели отредактировать, не перезаписывается.
+        """
+        names = {}
+        for _, name in rows:
+            if name in names:
+                continue
+            try:
+                names[name] = default_storage.adopt(name, directory)
+            except OSError as error:
+                self.stderr.write(f'Пропущен {name}: {error}')
+        moved = {}
+        with transaction.atomic():
+            for old, new in names.items():
+                count = Post.objects.filter(
+                    pk__in=[pk for pk, _ in rows], image=old
+                ).update(image=new)
+                if count:
+                    counters.bump_media(new, count)
+                    counters.bump_media(old, -count)
+                    media.schedule_collect(old)
+                    moved[new] = count
+        for new in moved:
+            post_id = Post.objects.filter(image=new).values_list(
+                'pk', flat=True
+            ).first()
+            if post_id is not None:
+                thumbnails.generate(post_id)
+        return sum(moved.values())
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError('Хранилище по умолчанию не адресуется хэшем')
+        size = options['batch_size']
+        directory = Post._meta.get_field('image').upload_to.strip('/')
+        posts = Post.objects.exclude(image='').order_by('pk')
+        last_pk, moved = 0, 0
+        while True:
+            rows = list(
+                posts.filter(pk__gt=last_pk).values_list('pk', 'image')[:size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            flat = [
+                (pk, name) for pk, name in rows
+                if os.path.dirname(name) == directory
+            ]
+            if flat:
+                moved += self.move(flat, directory)
+        fragments.bump(PAGES, fragments.ALL_FEEDS)
+        self.stdout.write(f'Перенесено картинок постов: {moved}')
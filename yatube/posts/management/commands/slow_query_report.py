@@ -0,0 +1,98 @@
+import json
+from collections import Counter
+
+from core import slow_queries
+from django.core.management.base import BaseCommand, CommandError
+
+ORDER = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: group['count'],
+    'max': lambda group: group['max_ms'],
+}
+# представлений и мест в коде на отпечаток
+TOP = 3
+
+
+def read(path):
+    """Записи журнала; недописанные строки пропускаются."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        raise CommandError(f'Журнала {path} нет')
+
+
+def aggregate(entries):
+    """Записи, сгруппированные по отпечатку SQL."""
+    groups = {}
+    for entry in entries:
+        normalized = slow_queries.fingerprint(entry['sql'])
+        key = slow_queries.fingerprint_id(normalized)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                'fingerprint': key,
+                'sql': normalized,
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'views': Counter(),
+                'places': Counter(),
+                'plan': None,
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['ms']
+        group['views'][entry.get('view') or '-'] += 1
+        for place in (entry.get('frame'), entry.get('template')):
+            if place:
+                group['places'][place] += 1
+        if entry['ms'] >= group['max_ms']:
+            # план и параметры — у самого медленного вызова
+            group['max_ms'] = entry['ms']
+            group['plan'] = entry.get('plan')
+            group['params'] = entry.get('params')
+    return list(groups.values())
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов: запросы, одинаковые с '
+        'точностью до значений, складываются, сверху — худшие.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Журнал, по умолчанию из настроек')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--sort', choices=ORDER, default='total')
+        parser.add_argument(
+            '--plans', action='store_true', help='Печатать планы'
+        )
+
+    def handle(self, *args, **options):
+        groups = aggregate(read(options['log'] or slow_queries.log_path()))
+        groups.sort(key=ORDER[options['sort']], reverse=True)
+        for group in groups[:options['limit']]:
+            self.stdout.write(
+                f'{group["fingerprint"]}  {group["count"]:>6} раз  '
+                f'всего {group["total_ms"]:.1f} мс  '
+                f'среднее {group["total_ms"] / group["count"]:.1f} мс  '
+                f'макс. {group["max_ms"]:.1f} мс'
+            )
+            self.stdout.write(f'    {group["sql"]}')
+            views = ', '.join(
+                f'{name} ({count})'
+                for name, count in group['views'].most_common(TOP)
+            )
+            self.stdout.write(f'    представления: {views}')
+            for place, count in group['places'].most_common(TOP):
+                self.stdout.write(f'    {place} ({count})')
+            if options['plans'] and group['plan']:
+                self.stdout.write(f'    параметры: {group["params"]}')
+                for line in group['plan']:
+                    self.stdout.write(f'      {line}')
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
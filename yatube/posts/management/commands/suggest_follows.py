@@ -0,0 +1,248 @@
+import resource
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from posts.models import Follow, FollowSuggestion, UserStats
+from posts.settings import SUGGESTIONS_TOP
+from scipy import sparse
+
+# строк Follow с курсора за раз
+FETCH = 100_000
+# пользователей в блоке: столько id уходит в один IN (...)
+BLOCK_USERS = 2000
+
+
+def edges():
+    """Ребра подписок двумя массивами: 10 млн строк мимо ORM."""
+    user = Follow._meta.get_field('user').column
+    author = Follow._meta.get_field('author').column
+    chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {user}, {author} FROM {Follow._meta.db_table}'
+        )
+        while True:
+            rows = cursor.fetchmany(FETCH)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    if not chunks:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    pairs = np.concatenate(chunks)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def adjacency(users, authors):
+    """Разреженная матрица A[u, v] = 1, если u подписан на v.
+
+    Строки и столбцы — номера в ids, отсортированном массиве id всех
+    пользователей, у которых есть хоть одно ребро.
+    """
+    ids = np.unique(np.concatenate((users, authors)))
+    rows = np.searchsorted(ids, users).astype(np.int32)
+    cols = np.searchsorted(ids, authors).astype(np.int32)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), np.float32), (rows, cols)),
+        shape=(len(ids), len(ids)),
+    )
+    return ids, matrix
+
+
+def top_k(row, col, data, k):
+    """Первые k значений каждой строки, по убыванию; ничьи — по col.
+
+    Возвращает те же массивы, отсортированные по строке и месту, и
+    место в строке.
+    """
+    order = np.lexsort((col, -data, row))
+    row, col, data = row[order], col[order], data[order]
+    rank = np.arange(len(row)) - np.searchsorted(row, row)
+    keep = rank < k
+    return row[keep], col[keep], data[keep], rank[keep]
+
+
+def strongest(matrix, k):
+    """CSR-матрица, где в каждой строке оставлены k наибольших.
+
+    Полная сортировка миллионов похожестей блока (top_k) стоила бы
+    больше самого умножения; argpartition по строке — линейный.
+    """
+    matrix = matrix.tocsr()
+    keep = np.ones(matrix.nnz, bool)
+    for row in np.flatnonzero(np.diff(matrix.indptr) > k):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        weak = np.argpartition(-matrix.data[start:end], k)[k:]
+        keep[start + weak] = False
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    return sparse.csr_matrix(
+        (matrix.data[keep], (rows[keep], matrix.indices[keep])),
+        shape=matrix.shape,
+    )
+
+
+def without(matrix, rows):
+    """COO-тройки матрицы блока без нулей и без себя самого."""
+    matrix = matrix.tocoo()
+    keep = (matrix.data > 0) & (matrix.col != rows[matrix.row])
+    return matrix.row[keep], matrix.col[keep], matrix.data[keep]
+
+
+class Scorer:
+    """Оценки «друзья друзей» и «читают то же, что вы».
+
+    fof = A_b · A: сколько из ваших авторов подписаны на кандидата.
+    Похожие читатели — косинус по общим подпискам (A_b · A_c^T), где
+    авторы с числом подписчиков больше popular_cap не учитываются: они
+    почти ничего не говорят о вкусе, а блок от них становится плотным.
+    От каждого читателя берутся neighbors самых похожих, и
+    cof = S · A — их подписки с весом похожести.
+    """
+
+    def __init__(self, matrix, options):
+        self.matrix = matrix
+        self.options = options
+        self.following = np.diff(matrix.indptr)
+        followers = np.bincount(matrix.indices, minlength=matrix.shape[0])
+        rare = (followers <= options['popular_cap']).astype(np.float32)
+        self.rare_t = (matrix @ sparse.diags(rare)).T.tocsr()
+        with np.errstate(divide='ignore'):
+            self.norm = np.where(
+                self.following > 0, 1 / np.sqrt(self.following), 0
+            ).astype(np.float32)
+        # верхняя оценка ненулей в строке блока: по ней режутся блоки
+        self.cost = (
+            matrix @ self.following.astype(np.float32)
+            + matrix @ (followers * rare)
+            + 1
+        )
+
+    def blocks(self, rows):
+        """Блоки строк, у которых оценка ненулей не больше max_nnz."""
+        total = np.cumsum(self.cost[rows])
+        start = 0
+        while start < len(rows):
+            done = total[start - 1] if start else 0
+            end = int(np.searchsorted(
+                total, done + self.options['max_nnz'], side='right'
+            ))
+            end = min(max(end, start + 1), start + BLOCK_USERS)
+            yield rows[start:end]
+            start = end
+
+    def score(self, rows):
+        block = self.matrix[rows]
+        fof = block @ self.matrix
+        similar = sparse.diags(self.norm[rows]) @ (block @ self.rare_t)
+        similar = similar @ sparse.diags(self.norm)
+        row, col, data = without(similar, rows)
+        similar = strongest(sparse.csr_matrix(
+            (data, (row, col)), shape=similar.shape
+        ), self.options['neighbors'])
+        scores = fof + self.options['cofollow_weight'] * (
+            similar @ self.matrix
+        )
+        # на своих авторов уже подписан
+        scores = scores - scores.multiply(block)
+        return top_k(*without(scores, rows), self.options['top'])
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает, кого почитать каждому пользователю: друзья друзей и '
+        'подписки похожих читателей, на разреженной матрице подписок. '
+        'Лучшие --top пишутся в FollowSuggestion. С --stale пересчитываются '
+        'только пользователи, чьи подписки менялись.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=SUGGESTIONS_TOP)
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Только пользователи с измененными подписками',
+        )
+        parser.add_argument(
+            '--max-nnz', type=int, default=5_000_000,
+            help='Ненулей в матрицах одного блока, ограничивает память',
+        )
+        parser.add_argument('--neighbors', type=int, default=50)
+        parser.add_argument('--cofollow-weight', type=float, default=0.5)
+        parser.add_argument(
+            '--popular-cap', type=int, default=10_000,
+            help='Авторы с большим числом подписчиков не делают '
+            'читателей похожими',
+        )
+
+    def clear_flags(self, users, following, flagged):
+        """Снимает флаги у посчитанных пользователей из flagged.
+
+        Флаг остается, если число подписок уже не то, что попало в
+        матрицу: пользователь подписался во время расчета.
+        """
+        by_count = defaultdict(list)
+        for user_id, count in zip(users, following):
+            if user_id in flagged:
+                by_count[count].append(user_id)
+        for count, user_ids in by_count.items():
+            UserStats.objects.filter(
+                pk__in=user_ids, following_count=count,
+                suggestions_stale=True,
+            ).update(suggestions_stale=False)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # Флаги снимаются поблочно вместе с записью рекомендаций: если
+        # расчет оборвется, --stale досчитает оставшихся.
+        flagged = set(UserStats.objects.filter(
+            suggestions_stale=True
+        ).values_list('pk', flat=True))
+        ids, matrix = adjacency(*edges())
+        in_graph = set(ids.tolist())
+        if options['stale']:
+            rows = np.flatnonzero(np.isin(ids, list(flagged)))
+            gone = flagged - in_graph
+        else:
+            rows = np.arange(len(ids))
+            gone = (flagged | set(
+                FollowSuggestion.objects.values_list('user_id', flat=True)
+            )) - in_graph
+        self.stdout.write(
+            f'Ребер: {matrix.nnz}, пользователей в графе: {len(ids)}, '
+            f'к расчету: {len(rows)}'
+        )
+        scorer = Scorer(matrix, options)
+        written = blocks = 0
+        for block in scorer.blocks(rows):
+            row, col, data, rank = scorer.score(block)
+            users = ids[block].tolist()
+            with transaction.atomic():
+                FollowSuggestion.objects.filter(user_id__in=users).delete()
+                FollowSuggestion.objects.bulk_create(
+                    FollowSuggestion(
+                        user_id=user_id, author_id=author_id,
+                        rank=place, score=score,
+                    )
+                    for user_id, author_id, place, score in zip(
+                        ids[block][row].tolist(), ids[col].tolist(),
+                        rank.tolist(), data.tolist(),
+                    )
+                )
+                self.clear_flags(
+                    users, scorer.following[block].tolist(), flagged
+                )
+            written += len(row)
+            blocks += 1
+        gone = sorted(gone)
+        for start in range(0, len(gone), BLOCK_USERS):
+            users = gone[start:start + BLOCK_USERS]
+            with transaction.atomic():
+                FollowSuggestion.objects.filter(user_id__in=users).delete()
+                self.clear_flags(users, [0] * len(users), flagged)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+        self.stdout.write(
+            f'Блоков: {blocks}, рекомендаций: {written}, '
+            f'без подписок: {len(gone)}, пик памяти: {peak} МБ, '
+            f'{time.perf_counter() - started:.1f} с'
+        )
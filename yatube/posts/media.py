@@ -0,0 +1,50 @@
+# posts/media.py
+import logging
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaFile
+from .settings import MEDIA_COLLECT_GRACE
+
+logger = logging.getLogger(__name__)
+
+
+def _remove_unused(name):
+    grace = getattr(settings, 'POSTS_MEDIA_COLLECT_GRACE', MEDIA_COLLECT_GRACE)
+    with default_storage.exclusive(name) as touched:
+        if touched is not None and time.time() - touched < grace:
+            return False
+        with transaction.atomic():
+            unused = MediaFile.objects.select_for_update().filter(
+                name=name, refs=0
+            ).first()
+            if unused is None:
+                return False
+            unused.delete()
+            if touched is not None:
+                default_storage.delete(name)
+    return True
+
+
+def collect(name):
+    """Удаляет файл без ссылок вместе с его миниатюрами и записями KV.
+
+    Файл, записанный или загруженный повторно меньше
+    POSTS_MEDIA_COLLECT_GRACE секунд назад, остается: пост с ним может
+    быть еще не сохранен. Его строку с refs=0 подберет
+    reconcile_counters.
+    """
+    try:
+        if _remove_unused(name):
+            delete(ImageFile(name, default_storage), delete_file=False)
+    except Exception:
+        logger.exception('Не удалось удалить файл %s', name)
+
+
+def schedule_collect(name):
+    transaction.on_commit(lambda: collect(name))
@@ -0,0 +1,110 @@
+# posts/middleware.py
+import hashlib
+import logging
+
+from django.core.cache import caches
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from . import fragments
+from .models import Comment, Post
+from .settings import PAGE_CACHE_TIMEOUT
+
+PAGE_KEY = 'page:{}'
+PAGES = 'pages'
+# отдельный кэш с большими слотами: страница не влезает в обычный
+PAGE_CACHE = 'pages'
+
+logger = logging.getLogger(__name__)
+
+
+def _latest(queryset, field='pub_date'):
+    return queryset.order_by(f'-{field}').values_list(
+        field, flat=True
+    ).first()
+
+
+def _post_detail(post_id):
+    dates = (
+        _latest(Post.objects.filter(pk=post_id)),
+        _latest(Comment.objects.filter(post_id=post_id), 'created'),
+    )
+    return max((date for date in dates if date is not None), default=None)
+
+
+# Самая свежая дата, от которой зависит страница: из нее строится ETag.
+VALIDATORS = {
+    'posts:index': lambda: _latest(Post.objects.all()),
+    'posts:group': lambda slug: _latest(
+        Post.objects.filter(group__slug=slug)
+    ),
+    'posts:profile': lambda username: _latest(
+        Post.objects.filter(author__username=username)
+    ),
+    'posts:post_detail': _post_detail,
+    'posts:post_comments': lambda post_id: _latest(
+        Comment.objects.filter(post_id=post_id), 'created'
+    ),
+}
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых страниц лент и поста для анонимных посетителей.
+
+    Ключ — ETag страницы: путь с параметрами, дата последнего
+    изменения и поколение PAGES, которое сдвигают записи постов,
+    комментариев и групп (удаление не двигает даты). На совпавший
+    If-None-Match отвечает 304. Last-Modified не отдается: по одной
+    дате правку или удаление не заметить, и If-Modified-Since дал бы
+    304 на устаревшую страницу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        validator = self.validator(request)
+        if validator is None:
+            return self.get_response(request)
+        etag = self.etag(request, validator())
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+        pages = caches[PAGE_CACHE]
+        key = PAGE_KEY.format(etag.strip('"'))
+        response = pages.get(key)
+        if response is not None:
+            return response
+        response = self.get_response(request)
+        if response.status_code == 200 and not response.cookies:
+            response['ETag'] = etag
+            if pages.set_many({key: response}, PAGE_CACHE_TIMEOUT):
+                logger.warning(
+                    'Страница %s (%s байт) не влезла в кэш страниц',
+                    request.path, len(response.content),
+                )
+        return response
+
+    def validator(self, request):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        # ответ из кэша минует резолвер Django, а метрикам нужно имя
+        request.resolver_match = match
+        validator = VALIDATORS.get(match.view_name)
+        if validator is None:
+            return None
+        return lambda: validator(*match.args, **match.kwargs)
+
+    def etag(self, request, last_modified):
+        generation = fragments.generations((PAGES,))[PAGES]
+        raw = '{}|{}|{}'.format(
+            request.get_full_path(),
+            last_modified.isoformat() if last_modified else '',
+            generation,
+        )
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
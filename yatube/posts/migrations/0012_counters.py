@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(Subquery(
+        rows.values(field).annotate(n=Count('pk')).values('n')
+    ), 0)
+
+
+def count_existing(apps, schema_editor):
+    # строки UserStats не нужны: их пересчитывает первое чтение
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Комментариев'),
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счетчики пользователя',
+            },
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 13:00
+
+from django.db import migrations
+from posts import search
+
+
+def install(apps, schema_editor):
+    search.install(schema_editor)
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) "
+            f"VALUES ('rebuild')"
+        )
+
+
+def uninstall(apps, schema_editor):
+    search.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
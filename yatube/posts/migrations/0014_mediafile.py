@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    rows = Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(refs=Count('pk'))
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=row['image'], refs=row['refs']) for row in rows),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+            },
+        ),
+        migrations.RunPython(count_refs, migrations.RunPython.noop),
+    ]
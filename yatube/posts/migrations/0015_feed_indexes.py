@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_mediafile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowSuggestion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggested_to', to=settings.AUTH_USER_MODEL, verbose_name='Кого')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follow_suggestions', to=settings.AUTH_USER_MODEL, verbose_name='Кому')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация подписки',
+                'ordering': ('user', 'rank'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='followsuggestion',
+            constraint=models.UniqueConstraint(fields=('user', 'rank'), name='suggestion_user_rank'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='suggestions_stale',
+            field=models.BooleanField(default=True, verbose_name='Рекомендации устарели'),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(condition=models.Q(suggestions_stale=True), fields=['user'], name='stats_suggestions_stale_idx'),
+        ),
+    ]
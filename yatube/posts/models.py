@@ -8,6 +8,7 @@ class Group(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     slug = models.SlugField('Путь', unique=True)
     description = models.TextField('Oписание', max_length=200)
+    posts_count = models.PositiveIntegerField('Постов', default=0)
 
     class Meta:
         verbose_name = 'Группы'
@@ -39,10 +40,23 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
 
     class Meta:
         verbose_name = 'Посты'
         ordering = ('-pub_date',)
+        # ключ курсора ленты — (pub_date, id), см. posts.paginator
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'), name='post_date_idx'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -70,6 +84,12 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text
@@ -92,6 +112,11 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         ordering = ('-author',)
+        indexes = (
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'
+            ),
+        )
         constraints = (
             models.CheckConstraint(
                 check=models.Q('user' != 'author'),
@@ -102,3 +127,107 @@ class Follow(models.Model):
                 name='unique'
             )
         )
+
+
+class TimelineEntry(models.Model):
+    """Готовая лента подписок: пост, разложенный подписчику при записи."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='timeline_user_date_idx',
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='timeline_unique'
+            ),
+        )
+
+
+class FollowSuggestion(models.Model):
+    """Кого почитать: результат офлайн-расчета suggest_follows."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Кому',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+        verbose_name='Кого',
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация подписки'
+        ordering = ('user', 'rank')
+        constraints = (
+            # заодно индекс для боковой панели профиля
+            models.UniqueConstraint(
+                fields=('user', 'rank'),
+                name='suggestion_user_rank'
+            ),
+        )
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, которые нельзя держать в auth.User."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # подписки менялись после расчета рекомендаций (suggest_follows)
+    suggestions_stale = models.BooleanField(
+        'Рекомендации устарели', default=True
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        indexes = (
+            models.Index(
+                fields=('user',), name='stats_suggestions_stale_idx',
+                condition=models.Q(suggestions_stale=True),
+            ),
+        )
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class MediaFile(models.Model):
+    """Файл в хранилище и число постов, которые на него ссылаются."""
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,122 @@
+# posts/paginator.py
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from posts.settings import NUMBER_OF_POSTS
+
+
+def encode_cursor(date, pk):
+    """Курсор — это пара (дата, id) в base64, пригодная для url."""
+    raw = f'{date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает курсор; на мусор возвращает None (как get_page)."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        date, pk = raw.decode().rsplit('|', 1)
+        date, pk = parse_datetime(date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (date_field, id) без COUNT(*) и OFFSET.
+
+    Выбирается per_page + 1 строка за курсором, лишняя строка
+    говорит о том, что есть следующая страница. Поэтому глубокие
+    страницы стоят столько же, сколько первая.
+
+    Номера страниц условные: у страницы с предыдущей номер 2,
+    а num_pages на единицу больше, если есть следующая. Так
+    стандартные Page.has_next()/has_previous() работают без COUNT.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date'):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    @property
+    def page_range(self):
+        return range(1, self._num_pages + 1)
+
+    # Лишнее с виду условие date <= key дает базе границу диапазона
+    # по индексу (date, id): на одном OR она сканирует индекс с начала.
+    def _after(self, key):
+        date, pk = key
+        return self.object_list.filter(
+            Q(**{f'{self.date_field}__lte': date}),
+            Q(**{f'{self.date_field}__lt': date})
+            | Q(**{self.date_field: date, 'id__lt': pk}),
+        )
+
+    def _before(self, key):
+        date, pk = key
+        return self.object_list.filter(
+            Q(**{f'{self.date_field}__gte': date}),
+            Q(**{f'{self.date_field}__gt': date})
+            | Q(**{self.date_field: date, 'id__gt': pk}),
+        )
+
+    def cursor(self, obj):
+        return encode_cursor(getattr(obj, self.date_field), obj.pk)
+
+    def decode_cursor(self, token):
+        return decode_cursor(token)
+
+    def _rows(self, key, descending, limit):
+        """Не более limit объектов строго за курсором key."""
+        queryset = self.object_list
+        if key is not None:
+            queryset = self._after(key) if descending else self._before(key)
+        field = self.date_field
+        order = (f'-{field}', '-id') if descending else (field, 'id')
+        return list(queryset.order_by(*order)[:limit])
+
+    def get_page(self, after=None, before=None):
+        """Страница после курсора after или перед курсором before."""
+        after = self.decode_cursor(after)
+        before = self.decode_cursor(before)
+        limit = self.per_page + 1
+        rows = []
+        if before is not None:
+            rows = self._rows(before, False, limit)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        if not rows:
+            rows = self._rows(after, True, limit)
+            has_previous = after is not None
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        number = 2 if has_previous else 1
+        self._num_pages = number + int(has_next)
+        page = Page(rows, number, self)
+        page.next_cursor = self.cursor(rows[-1]) if has_next else None
+        page.previous_cursor = (
+            self.cursor(rows[0]) if has_previous and rows else None
+        )
+        return page
+
+
+def get_cursor_page(request, queryset, per_page=NUMBER_OF_POSTS):
+    """page_obj для ленты по параметрам ?after= / ?before= запроса."""
+    paginator = CursorPaginator(queryset, per_page)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
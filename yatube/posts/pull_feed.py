@@ -0,0 +1,116 @@
+# posts/pull_feed.py
+import heapq
+from itertools import chain, dropwhile, islice
+
+from django.core.cache import cache
+
+from .models import Post
+from .paginator import CursorPaginator
+from .settings import AUTHOR_FEED_LENGTH, AUTHOR_FEED_TIMEOUT
+
+AUTHOR_FEED_KEY = 'author_feed:{}'
+
+
+def _key(author_id):
+    return AUTHOR_FEED_KEY.format(author_id)
+
+
+def _load(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('pub_date', 'id')[:AUTHOR_FEED_LENGTH]
+    )
+
+
+def recent(author_ids):
+    """Свежие ключи (pub_date, id) постов по id автора, новые первыми.
+
+    Все списки читаются из кэша одним get_many, промахи добираются
+    из базы и кладутся обратно одним set_many.
+    """
+    keys = {_key(author_id): author_id for author_id in author_ids}
+    found = cache.get_many(keys)
+    missing = {
+        key: _load(author_id)
+        for key, author_id in keys.items() if key not in found
+    }
+    if missing:
+        cache.set_many(missing, AUTHOR_FEED_TIMEOUT)
+        found.update(missing)
+    return {keys[key]: items for key, items in found.items()}
+
+
+def push(post):
+    """Новый пост автора встает в начало его закэшированного списка."""
+    key = _key(post.author_id)
+    items = cache.get(key)
+    if items is None:
+        return
+    items.insert(0, (post.pub_date, post.pk))
+    cache.set(key, items[:AUTHOR_FEED_LENGTH], AUTHOR_FEED_TIMEOUT)
+
+
+def forget(author_id):
+    """После удаления список перечитается из базы при следующем чтении."""
+    cache.delete(_key(author_id))
+
+
+def _stored(author_id, key, descending, limit):
+    """Ключи автора из базы строго за курсором key.
+
+    Генератор: запрос уходит, только когда слияние дочитало до него.
+    """
+    queryset = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pub_date', 'id')
+    yield from CursorPaginator(queryset, limit or 1)._rows(
+        key, descending, limit
+    )
+
+
+def _stream(author_id, items, key, descending, limit):
+    """Ключи одного автора за курсором key в порядке слияния.
+
+    Полный список в кэше — только AUTHOR_FEED_LENGTH свежих постов
+    автора: все, что старше его хвоста, добирается из базы.
+    """
+    tail = items[-1] if len(items) >= AUTHOR_FEED_LENGTH else None
+    if descending:
+        if key is not None:
+            items = dropwhile(lambda item: item >= key, items)
+        if tail is None:
+            return items
+        bound = tail if key is None else min(key, tail)
+        return chain(items, _stored(author_id, bound, True, limit))
+    if tail is not None and (key is None or key < tail):
+        return _stored(author_id, key, False, limit)
+    items = reversed(items)
+    if key is not None:
+        items = dropwhile(lambda item: item <= key, items)
+    return items
+
+
+def merge(author_ids, key=None, descending=True, limit=None):
+    """k-путевое слияние списков авторов через кучу.
+
+    Отдает ключи строго за курсором key: более старые при
+    descending, более новые иначе.
+    """
+    streams = [
+        _stream(author_id, items, key, descending, limit)
+        for author_id, items in recent(author_ids).items()
+    ]
+    return list(islice(heapq.merge(*streams, reverse=descending), limit))
+
+
+class PullPaginator(CursorPaginator):
+    """Лента подписок, собранная при чтении без Post ⋈ Follow.
+
+    object_list — id авторов, на которых подписан читатель.
+    """
+
+    def _rows(self, key, descending, limit):
+        ids = [pk for _, pk in merge(self.object_list, key, descending, limit)]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,156 @@
+# posts/search.py
+import re
+import struct
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginator import CursorPaginator
+from .settings import NUMBER_OF_POSTS
+
+FTS_TABLE = 'posts_post_fts'
+# Маркеры подсветки, которых не бывает в тексте: сниппет сначала
+# экранируется целиком, и только потом они меняются на <mark>.
+_OPEN, _CLOSE = '\x02', '\x03'
+
+INSTALL_SQL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+UNINSTALL_SQL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def install(schema_editor):
+    """Индекс и триггеры синхронизации с posts_post.
+
+    SQLite теряет триггеры, когда Django пересоздает таблицу
+    posts_post в миграции, поэтому такие миграции зовут install
+    повторно: все операторы идемпотентны.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in INSTALL_SQL:
+        schema_editor.execute(sql)
+
+
+def uninstall(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in UNINSTALL_SQL:
+        schema_editor.execute(sql)
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксис MATCH: все слова, по префиксу.
+
+    Каждое слово берется в кавычки, так что операторы FTS5 из
+    пользовательского ввода не разбираются.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+    )
+
+
+def encode_rank(rank, pk):
+    # float в курсоре храним побитно, чтобы сравнение было точным
+    return '{}_{}'.format(struct.pack('>d', rank).hex(), pk)
+
+
+def decode_rank(token):
+    if not token:
+        return None
+    try:
+        rank, pk = token.split('_')
+        return struct.unpack('>d', bytes.fromhex(rank))[0], int(pk)
+    except (ValueError, struct.error):
+        return None
+
+
+class SearchPaginator(CursorPaginator):
+    """Результаты поиска по ключу (bm25, rowid); меньший bm25 — лучше.
+
+    object_list — выражение MATCH.
+    """
+
+    def decode_cursor(self, token):
+        return decode_rank(token)
+
+    def cursor(self, obj):
+        return encode_rank(obj.rank, obj.pk)
+
+    def _rows(self, key, descending, limit):
+        if not self.object_list:
+            return []
+        sql = f"""
+            SELECT rowid, score, snippet FROM (
+                SELECT rowid, bm25({FTS_TABLE}) AS score,
+                       snippet({FTS_TABLE}, 0, %s, %s, '…', 16) AS snippet
+                FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+            )
+        """
+        params = [_OPEN, _CLOSE, self.object_list]
+        sign = '>' if descending else '<'
+        if key is not None:
+            sql += (
+                f'WHERE score {sign} %s '
+                f'OR (score = %s AND rowid {sign} %s)'
+            )
+            params += [key[0], key[0], key[1]]
+        order = 'ASC' if descending else 'DESC'
+        sql += f' ORDER BY score {order}, rowid {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            hits = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _, _ in hits]
+        )
+        rows = []
+        for pk, rank, snippet in hits:
+            post = posts.get(pk)
+            if post is not None:
+                post.rank, post.snippet = rank, highlight(snippet)
+                rows.append(post)
+        return rows
+
+
+def search_page(query, after=None, before=None, per_page=NUMBER_OF_POSTS):
+    paginator = SearchPaginator(match_expression(query), per_page)
+    return paginator.get_page(after=after, before=before)
+
+
+def matching_ids_sql(query):
+    """Подзапрос id постов для фильтра pk__in в админке."""
+    return (
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)],
+    )
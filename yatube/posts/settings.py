@@ -1,2 +1,20 @@
 EMPTY_VALUE_DISPLAY = '-пусто-'
 NUMBER_OF_POSTS = 10
+COMMENTS_PER_PAGE = 20
+TIMELINE_LENGTH = 1000
+FOLLOW_FEED = 'pull'
+AUTHOR_FEED_LENGTH = 200
+AUTHOR_FEED_TIMEOUT = 60 * 60
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+# рекомендаций подписок: считается на пользователя и показывается
+SUGGESTIONS_TOP = 20
+SUGGESTIONS_SHOWN = 5
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+PAGE_CACHE_TIMEOUT = 60 * 60
+THUMBNAIL_GEOMETRIES = (
+    ('100x100', {'crop': 'center'}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+THUMBNAIL_WORKERS = 2
+# столько секунд после загрузки файл без ссылок не удаляется
+MEDIA_COLLECT_GRACE = 60 * 60
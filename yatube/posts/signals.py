@@ -0,0 +1,123 @@
+# posts/signals.py
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    counters, follow_graph, fragments, media, pull_feed, suggestions,
+    thumbnails, timeline,
+)
+from .middleware import PAGES
+from .models import Comment, Follow, Group, Post
+
+
+# прочитанное пачкой не должно пережить запрос
+request_finished.connect(thumbnails.forget_primed)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_previous(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, '')
+        )
+
+
+def image_changed(old, new):
+    if old == new:
+        return
+    if new:
+        counters.bump_media(new, 1)
+    if old:
+        counters.bump_media(old, -1)
+        media.schedule_collect(old)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    fragments.bump(PAGES, *fragments.post_feeds(
+        instance.author_id, instance.group_id, previous_group_id
+    ))
+    previous_image = getattr(instance, '_previous_image', '')
+    image_changed(previous_image, instance.image.name or '')
+    if previous_image != (instance.image.name or ''):
+        thumbnails.schedule(instance)
+    if not created:
+        if previous_group_id != instance.group_id:
+            if previous_group_id:
+                counters.bump(Group, previous_group_id, posts_count=-1)
+            if instance.group_id:
+                counters.bump(Group, instance.group_id, posts_count=1)
+        return
+    counters.bump_user(instance.author_id, posts_count=1)
+    if instance.group_id:
+        counters.bump(Group, instance.group_id, posts_count=1)
+    pull_feed.push(instance)
+    if timeline.enabled():
+        timeline.schedule_fan_out(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    fragments.bump(PAGES, *fragments.post_feeds(
+        instance.author_id, instance.group_id
+    ))
+    counters.bump_user(instance.author_id, posts_count=-1)
+    if instance.group_id:
+        counters.bump(Group, instance.group_id, posts_count=-1)
+    pull_feed.forget(instance.author_id)
+    image_changed(instance.image.name or '', '')
+
+
+def comment_changed(comment):
+    post = Post.objects.filter(pk=comment.post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    fragments.bump(PAGES)
+    if post is not None:
+        fragments.bump(*fragments.post_feeds(*post))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    comment_changed(instance)
+    if created:
+        counters.bump(Post, instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    comment_changed(instance)
+    counters.bump(Post, instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    fragments.bump(PAGES, fragments.ALL_FEEDS)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    follow_graph.changed(instance.user_id, instance.author_id)
+    suggestions.mark_stale(instance.user_id)
+    counters.bump_user(instance.user_id, following_count=1)
+    counters.bump_user(instance.author_id, followers_count=1)
+    if timeline.enabled():
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follow_graph.changed(instance.user_id, instance.author_id)
+    suggestions.mark_stale(instance.user_id)
+    counters.bump_user(instance.user_id, following_count=-1)
+    counters.bump_user(instance.author_id, followers_count=-1)
+    timeline.drop(instance.user_id, instance.author_id)
@@ -0,0 +1,35 @@
+# posts/suggestions.py
+from . import follow_graph
+from .models import FollowSuggestion, UserStats
+from .settings import SUGGESTIONS_SHOWN
+
+
+def for_user(user, exclude=None):
+    """Кого почитать: одна выборка по индексу (user, rank).
+
+    Рекомендации считает офлайн suggest_follows, поэтому авторы, на
+    которых пользователь подписался после расчета, отсеиваются по
+    графу подписок в кэше.
+    """
+    if not user.is_authenticated:
+        return []
+    suggestions = list(
+        FollowSuggestion.objects.filter(user=user).select_related(
+            'author'
+        )[:SUGGESTIONS_SHOWN * 2]
+    )
+    if not suggestions:
+        return []
+    followed = follow_graph.followed_among(
+        user.pk, [suggestion.author_id for suggestion in suggestions]
+    )
+    return [
+        suggestion.author for suggestion in suggestions
+        if suggestion.author_id not in followed
+        and suggestion.author_id != exclude
+    ][:SUGGESTIONS_SHOWN]
+
+
+def mark_stale(user_id):
+    """Подписки изменились: suggest_follows --stale пересчитает."""
+    UserStats.objects.filter(pk=user_id).update(suggestions_stale=True)
@@ -0,0 +1,11 @@
+from django import template
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prime_thumbnails(posts, geometry_string, **options):
+    """Ставится перед циклом с {% thumbnail %} с теми же опциями."""
+    thumbnails.prime(posts, geometry_string, **options)
+    return ''
@@ -0,0 +1,28 @@
+# Бюджет запросов к базе для тестов представлений
+# posts/tests/budget.py
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Миксин для TestCase: assertQueryBudget(n) вокруг запроса к странице.
+
+    В отличие от assertNumQueries бюджет — верхняя граница: страница
+    может стать дешевле, но не дороже. При превышении в сообщении
+    перечислены все выполненные запросы.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(
+                f'{len(context)} запросов при бюджете {budget}:\n{queries}'
+            )
@@ -0,0 +1,56 @@
+# Проверка планов запросов для тестов представлений
+# posts/tests/plans.py
+import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Полный проход по таблице: SCAN без индекса. Проход по индексу
+# в нужном порядке с LIMIT — это и есть чтение ленты, он допустим.
+FULL_SCAN = re.compile(
+    r'^SCAN (TABLE )?(posts_post|posts_comment)\b(?! USING)'
+)
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def plan_problems(plan):
+    return [
+        detail for detail in plan
+        if FULL_SCAN.match(detail) or TEMP_SORT in detail
+    ]
+
+
+class QueryPlanMixin:
+    """Миксин для TestCase: assertQueryPlans(label) вокруг запроса.
+
+    Каждый SELECT, выполненный внутри блока, повторяется с EXPLAIN
+    QUERY PLAN. Полный проход по posts_post/posts_comment или
+    сортировка во временном B-дереве — ошибка с текстом запроса
+    и плана. Только для SQLite.
+    """
+
+    @contextmanager
+    def assertQueryPlans(self, label, using=DEFAULT_DB_ALIAS):
+        connection = connections[using]
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            yield statements
+        if connection.vendor != 'sqlite':
+            return
+        failures = []
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+                if plan_problems(plan):
+                    failures.append(f'{sql}\n  -> ' + '; '.join(plan))
+        if failures:
+            self.fail(f'{label}: плохие планы запросов:\n' + '\n'.join(
+                failures
+            ))
@@ -0,0 +1,50 @@
+# Тесты микробенчмарков
+# posts/tests/test_bench_micro.py
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from posts.management.commands import bench_micro
+
+
+class BenchMicroTest(SimpleTestCase):
+    def bench(self, **options):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        stdout = StringIO()
+        call_command(
+            'bench_micro', number=3, repeat=1, output=path, stdout=stdout,
+            **options
+        )
+        with open(path) as file:
+            return path, json.load(file), stdout.getvalue()
+
+    def test_cases_run_without_database(self):
+        """Все случаи считаются без базы: SimpleTestCase ее не дает"""
+        _, results, _ = self.bench()
+        self.assertEqual(
+            [row['case'] for row in results], list(bench_micro.CASES)
+        )
+        for row in results:
+            with self.subTest(case=row['case']):
+                self.assertEqual(set(row), {
+                    'case', 'us', 'kept_blocks', 'peak_kb'
+                })
+                self.assertGreaterEqual(row['peak_kb'], 0)
+
+    def test_card_renders_posts(self):
+        """Страница для карточек действительно содержит посты"""
+        render, items, empty = bench_micro.card()
+        html = render()
+        self.assertEqual(html.count('подробная информация'), items)
+        self.assertNotIn('подробная информация', empty())
+
+    def test_baseline(self):
+        """С базовым прогоном к строке добавляется разница во времени"""
+        path, _, _ = self.bench(cases=['filter: *'])
+        _, _, output = self.bench(cases=['filter: date'], baseline=path)
+        self.assertIn('%)', output.splitlines()[1])
@@ -0,0 +1,76 @@
+# Тесты замера задержек маршрутов
+# posts/tests/test_bench_urls.py
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from posts.management.commands import bench_urls
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class BenchUrlsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='Author')
+        reader = User.objects.create_user(username='Reader')
+        User.objects.create_user(username='Stranger')
+        group = Group.objects.create(title='Группа', slug='test')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Post.objects.create(text='Свой пост', author=reader)
+        Comment.objects.create(post=post, author=reader, text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+
+    def bench(self, **options):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        stderr = StringIO()
+        call_command(
+            'bench_urls', processes=1, requests=2, output=path,
+            stderr=stderr, **options
+        )
+        with open(path) as file:
+            return path, json.load(file), stderr.getvalue()
+
+    def test_every_route_is_measured(self):
+        """Каждый маршрут в четырех вариантах и без ошибок сервера"""
+        _, report, _ = self.bench()
+        expected = {
+            (route, user, cache)
+            for route, _ in bench_urls.routes()
+            for user in ('anonymous', 'user')
+            for cache in ('cold', 'warm')
+        }
+        rows = {
+            (row['route'], row['user'], row['cache']): row
+            for row in report['results']
+        }
+        self.assertEqual(set(rows), expected)
+        for key, row in rows.items():
+            with self.subTest(key=key):
+                self.assertEqual(row['requests'], 2)
+                self.assertNotIn('500', row['status'])
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        self.assertEqual(
+            rows[('posts:index', 'anonymous', 'warm')]['status'], {'200': 2}
+        )
+        self.assertGreater(rows[('posts:index', 'user', 'cold')]['bytes'], 0)
+
+    def test_baseline_diff(self):
+        """С базовым прогоном печатается разница по метрикам"""
+        path, _, _ = self.bench(routes=['about:*'])
+        _, _, diff = self.bench(routes=['about:tech'], baseline=path)
+        lines = diff.splitlines()
+        self.assertEqual(len(lines), 4 * len(bench_urls.COMPARED))
+        self.assertTrue(all(line.startswith('about:tech') for line in lines))
+
+    def test_own_cache_files(self):
+        """Холодный кэш чистится в своих файлах, а не в кэше деплоя"""
+        cache.set('kept', 1)
+        self.bench(routes=['about:tech'])
+        self.assertEqual(cache.get('kept'), 1)
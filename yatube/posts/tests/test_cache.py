@@ -1,6 +1,11 @@
+from unittest import mock
+
 from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
+from posts import fragments
+from posts.middleware import PAGES
+from posts.settings import NUMBER_OF_POSTS
 from posts.views import Post, User
 
 URL_INDEX = reverse('posts:index')
@@ -31,12 +36,45 @@ class IndexCacheTest(TestCase):
         """Тест успешного кэширования"""
         cache.clear()
         response = self.client.get(URL_INDEX)
-        test_response = self.client.get(URL_INDEX)
         self.assertIn(self.post, response.context['page_obj'])
-        Post.objects.all().delete()
-        self.assertNotIn(self.post, Post.objects.all())
-        response = self.client.get(URL_INDEX)
+        # update() идет в обход сигналов: страница берется из кэша
+        Post.objects.filter(pk=self.post.pk).update(text='Другой текст')
+        test_response = self.client.get(URL_INDEX)
         self.assertEqual(test_response.content, response.content)
+
+    def test_index_cache_invalidated_on_write(self):
+        """Удаление поста сразу сбрасывает кэш ленты"""
         cache.clear()
         response = self.client.get(URL_INDEX)
-        self.assertNotEqual(test_response.content, response.content)
+        self.assertContains(response, self.post.text)
+        Post.objects.all().delete()
+        response = self.client.get(URL_INDEX)
+        self.assertNotContains(response, self.post.text)
+
+    def test_cache_key_depends_on_page(self):
+        """У каждой страницы ленты свой кэш"""
+        cache.clear()
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user)
+            for i in range(NUMBER_OF_POSTS)
+        )
+        first = self.client.get(URL_INDEX)
+        next_cursor = first.context['page_obj'].next_cursor
+        second = self.client.get(URL_INDEX + f'?after={next_cursor}')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, self.post.text)
+
+    def test_generation_bumped_again_on_commit(self):
+        """Страница, закэшированная до коммита, сбрасывается после него"""
+        cache.clear()
+        callbacks = []
+        with mock.patch.object(
+            fragments.transaction, 'on_commit', callbacks.append
+        ):
+            fragments.bump(PAGES, *fragments.post_feeds(self.user.pk))
+        # запрос до коммита видит старый текст и кэширует его
+        self.client.get(URL_INDEX)
+        Post.objects.filter(pk=self.post.pk).update(text='После коммита')
+        for callback in callbacks:
+            callback()
+        self.assertContains(self.client.get(URL_INDEX), 'После коммита')
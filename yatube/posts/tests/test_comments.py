@@ -0,0 +1,66 @@
+# Тесты постраничной загрузки комментариев
+# posts/tests/test_comments.py
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Post, User
+from posts.settings import COMMENTS_PER_PAGE
+
+
+class CommentsPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Коммент {i}')
+            for i in range(COMMENTS_PER_PAGE * 2 + 5)
+        )
+        cls.URL_POST_DETAIL = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+        cls.URL_COMMENTS = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.id}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первая порция, новые первыми"""
+        response = self.client.get(self.URL_POST_DETAIL)
+        comments = response.context['comments']
+        newest = Comment.objects.filter(post=self.post).order_by(
+            '-created', '-id'
+        )
+        self.assertEqual(
+            list(comments), list(newest[:COMMENTS_PER_PAGE])
+        )
+        self.assertContains(response, 'js-more-comments')
+
+    def test_load_more_walks_all_comments(self):
+        """«Показать еще» по курсору отдает все комментарии без повторов"""
+        seen = []
+        after = self.client.get(
+            self.URL_POST_DETAIL
+        ).context['comments'].next_cursor
+        pages = 1
+        while after:
+            response = self.client.get(self.URL_COMMENTS, {'after': after})
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            seen += list(response.context['comments'])
+            after = response.context['comments'].next_cursor
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), COMMENTS_PER_PAGE + 5)
+        self.assertEqual(len(set(seen)), len(seen))
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_unknown_post(self):
+        """Фрагмент несуществующего поста — 404"""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 10 ** 6})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,97 @@
+# Тесты денормализованных счетчиков
+# posts/tests/test_counters.py
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test',
+            description='Тестовое описание'
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(pk=user.pk)
+
+    def test_post_counters(self):
+        """Посты автора и группы считаются при создании и удалении"""
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        Post.objects.create(text='Пост', author=self.author)
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.group.posts_count, 1)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_post_group_change(self):
+        """Смена группы при редактировании переносит счетчик"""
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        post.group = None
+        post.save()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_pages_render_counts_without_aggregates(self):
+        """Страницы не считают COUNT ради счетчиков"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        client = Client()
+        urls = (
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertContains(response, '1')
+                for query in queries.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'])
+
+    def test_reconcile_command(self):
+        """Команда сверки чинит разошедшиеся счетчики"""
+        Post.objects.bulk_create(
+            Post(text='Пост', author=self.author, group=self.group)
+            for _ in range(3)
+        )
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(self.stats(self.author).posts_count, 3)
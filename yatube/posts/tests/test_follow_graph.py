@@ -0,0 +1,110 @@
+# Тесты графа подписок в кэше
+# posts/tests/test_follow_graph.py
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import follow_graph
+from posts.models import Follow, User
+
+
+class ChunkTest(SimpleTestCase):
+    def test_array_and_bitmap(self):
+        """Редкий кусок — массив, плотный — битовая карта на 8 КБ"""
+        for lows in ([1, 5, 700], list(range(0, 65536, 3))):
+            with self.subTest(size=len(lows)):
+                chunk = follow_graph._pack(lows)
+                self.assertEqual(
+                    isinstance(chunk, bytes),
+                    len(lows) > follow_graph.ARRAY_LIMIT,
+                )
+                self.assertEqual(follow_graph._lows(chunk), lows)
+                self.assertTrue(follow_graph._contains(chunk, lows[-1]))
+                self.assertFalse(follow_graph._contains(chunk, 2))
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.near = User.objects.create_user(username='Near')
+        # id из другого куска: старшая часть не нулевая
+        cls.far = User.objects.create_user(username='Far', pk=70_000)
+        cls.stranger = User.objects.create_user(username='Stranger')
+        Follow.objects.create(user=cls.reader, author=cls.near)
+        Follow.objects.create(user=cls.reader, author=cls.far)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_membership(self):
+        """Подписки видны по одной и пачкой, из кэша — без запросов"""
+        authors = (self.near.pk, self.far.pk, self.stranger.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                follow_graph.followed_among(self.reader.pk, authors),
+                {self.near.pk, self.far.pk},
+            )
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader.pk, self.far.pk)
+            )
+            self.assertFalse(
+                follow_graph.is_following(self.reader.pk, self.stranger.pk)
+            )
+            self.assertEqual(
+                follow_graph.following(self.reader.pk),
+                [self.near.pk, self.far.pk],
+            )
+
+    def test_followers(self):
+        """Подписчики автора — обратное множество"""
+        self.assertEqual(follow_graph.followers(self.far.pk), [self.reader.pk])
+        self.assertEqual(follow_graph.followers(self.reader.pk), [])
+
+    def test_follow_writes_update_graph(self):
+        """Подписка и отписка сразу видны в закэшированном графе"""
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.stranger.pk)
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.stranger)
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.stranger.pk)
+        )
+        self.assertEqual(
+            follow_graph.followers(self.stranger.pk), [self.reader.pk]
+        )
+        follow.delete()
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.stranger.pk)
+        )
+        self.assertEqual(follow_graph.followers(self.stranger.pk), [])
+
+    def test_evicted_chunk_is_reloaded(self):
+        """Вытесненный кусок перечитывается диапазоном, а не целиком"""
+        follow_graph.following(self.reader.pk)
+        cache.delete(follow_graph._chunk_key(
+            follow_graph.FOLLOWING, self.reader.pk, self.far.pk >> 16
+        ))
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                follow_graph.is_following(self.reader.pk, self.far.pk)
+            )
+
+    def test_profile_uses_graph(self):
+        """Профиль и подписка не ходят в базу за проверкой подписки"""
+        client = Client()
+        client.force_login(self.reader)
+        follow_graph.following(self.reader.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('posts:profile', args=['Far']))
+        self.assertTrue(response.context['following'])
+        self.assertFalse([
+            query for query in queries if '"posts_follow"' in query['sql']
+        ])
+        client.get(reverse('posts:profile_follow', args=['Far']))
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader, author=self.far).count(),
+            1,
+        )
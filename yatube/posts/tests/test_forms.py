@@ -1,5 +1,6 @@
 # Тесты форм
 # posts/tests/test_forms.py
+import hashlib
 import shutil
 import tempfile
 
@@ -64,6 +65,7 @@ class TaskCreateFormTests(TestCase):
     def test_create_post(self):
         """Тест создания нового поста при отправке формы"""
         posts_count = Post.objects.count()
+        digest = hashlib.sha256(self.small_gif).hexdigest()
         form_data = {
             'group': self.group.id,
             'text': 'Тестовый текст',
@@ -79,7 +81,10 @@ class TaskCreateFormTests(TestCase):
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
-                image=f'posts/{self.uploaded.name}'
+                # имя файла — хэш содержимого
+                image='posts/{0:.2}/{1}/{0}.gif'.format(
+                    digest, digest[2:4]
+                )
             ).exists()
         )
         last_post_id = Post.objects.latest('id')
@@ -0,0 +1,102 @@
+# Тесты счетчика ссылок на картинки
+# posts/tests/test_media.py
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from posts import media
+from posts.models import MediaFile, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name, content=b'GIF89a-same-picture'):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_MEDIA_COLLECT_GRACE=0)
+class MediaRefsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def refs(self, name):
+        return MediaFile.objects.get(name=name).refs
+
+    def test_same_upload_is_shared(self):
+        """Одинаковые картинки — один файл и счетчик ссылок"""
+        first = Post.objects.create(
+            text='Раз', author=self.author, image=upload('a.gif')
+        )
+        second = Post.objects.create(
+            text='Два', author=self.author, image=upload('b.gif')
+        )
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self.refs(name), 2)
+        first.delete()
+        media.collect(name)
+        self.assertEqual(self.refs(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_last_reference_removes_file(self):
+        """Без ссылок файл удаляется; замена картинки снимает ссылку"""
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=upload('c.gif', b'old')
+        )
+        old = post.image.name
+        post.image = upload('d.gif', b'new')
+        post.save()
+        self.assertEqual(self.refs(old), 0)
+        self.assertEqual(self.refs(post.image.name), 1)
+        media.collect(old)
+        self.assertFalse(MediaFile.objects.filter(name=old).exists())
+        self.assertFalse(os.path.exists(os.path.join(TEMP_MEDIA_ROOT, old)))
+
+    def test_fresh_upload_is_kept(self):
+        """Только что загруженный файл не удаляется, даже без ссылок"""
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=upload('e.gif', b'fresh')
+        )
+        name = post.image.name
+        post.delete()
+        with self.settings(POSTS_MEDIA_COLLECT_GRACE=60):
+            media.collect(name)
+        self.assertEqual(self.refs(name), 0)
+        self.assertTrue(default_storage.exists(name))
+        media.collect(name)
+        self.assertFalse(default_storage.exists(name))
+
+    def test_shard_media_moves_flat_files(self):
+        """Команда переносит старые файлы в подкаталоги по хэшу"""
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts/old.gif'), 'wb') as f:
+            f.write(b'legacy')
+        posts = [
+            Post.objects.create(
+                text='Старый', author=self.author, image='posts/old.gif'
+            )
+            for _ in range(2)
+        ]
+        call_command('shard_media', batch_size=1, stdout=StringIO())
+        for post in posts:
+            post.refresh_from_db()
+        name = posts[0].image.name
+        self.assertRegex(name, r'^posts/\w\w/\w\w/[0-9a-f]{64}\.gif$')
+        self.assertEqual(posts[1].image.name, name)
+        self.assertEqual(self.refs(name), 2)
+        media.collect('posts/old.gif')
+        self.assertFalse(default_storage.exists('posts/old.gif'))
+        self.assertTrue(default_storage.exists(name))
@@ -0,0 +1,95 @@
+# Тесты кэша страниц для анонимов
+# posts/tests/test_page_cache.py
+import time
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+from posts.models import Comment, Post, User
+from posts.settings import NUMBER_OF_POSTS
+
+URL_INDEX = reverse('posts:index')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.URL_POST_DETAIL = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторный запрос аноним получает из кэша"""
+        first = self.client.get(URL_INDEX)
+        self.assertIn('ETag', first)
+        self.assertNotIn('Last-Modified', first)
+        with self.assertNumQueries(1):  # только дата для валидатора
+            second = self.client.get(URL_INDEX)
+        self.assertEqual(first.content, second.content)
+
+    def test_conditional_get(self):
+        """304 дает только совпавший ETag, одна дата — нет"""
+        response = self.client.get(self.URL_POST_DETAIL)
+        not_modified = self.client.get(
+            self.URL_POST_DETAIL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        response = self.client.get(
+            self.URL_POST_DETAIL,
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60),
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_full_feed_page_is_cached(self):
+        """Полная страница ленты с длинными постами тоже кэшируется"""
+        Post.objects.bulk_create(
+            Post(text='Длинный абзац поста. ' * 150, author=self.user)
+            for _ in range(NUMBER_OF_POSTS)
+        )
+        first = self.client.get(URL_INDEX)
+        self.assertGreater(len(first.content), 32 * 1024)
+        with self.assertNumQueries(1):
+            second = self.client.get(URL_INDEX)
+        self.assertEqual(first.content, second.content)
+
+    def test_oversize_page_logged(self):
+        """Страница больше слота не кэшируется, и это видно в журнале"""
+        Post.objects.bulk_create(
+            Post(text='Длинный абзац поста. ' * 1000, author=self.user)
+            for _ in range(NUMBER_OF_POSTS)
+        )
+        with self.assertLogs('posts.middleware', 'WARNING'):
+            self.client.get(URL_INDEX)
+
+    def test_comment_invalidates_page(self):
+        """Новый комментарий меняет ETag страницы поста"""
+        response = self.client.get(self.URL_POST_DETAIL)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий'
+        )
+        fresh = self.client.get(
+            self.URL_POST_DETAIL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(fresh.status_code, 200)
+        self.assertContains(fresh, 'Новый комментарий')
+
+    def test_delete_invalidates_page(self):
+        """Удаление поста сразу видно на главной"""
+        post = Post.objects.create(text='Второй пост', author=self.user)
+        self.assertContains(self.client.get(URL_INDEX), post.text)
+        post.delete()
+        self.assertNotContains(self.client.get(URL_INDEX), post.text)
+
+    def test_authorized_not_cached(self):
+        """Авторизованным страницы не кэшируются"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(URL_INDEX)
+        self.assertNotIn('ETag', response)
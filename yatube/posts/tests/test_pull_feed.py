@@ -0,0 +1,89 @@
+# Тесты ленты подписок, собираемой при чтении
+# posts/tests/test_pull_feed.py
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import pull_feed
+from posts.models import Follow, Post, User
+from posts.settings import NUMBER_OF_POSTS
+
+URL_FOLLOW_INDEX = reverse('posts:follow_index')
+
+
+@override_settings(POSTS_FOLLOW_FEED='pull')
+class PullFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.authors = [
+            User.objects.create_user(username=f'Author{i}') for i in range(3)
+        ]
+        for i in range(NUMBER_OF_POSTS):
+            for author in cls.authors:
+                Post.objects.create(text=f'Пост {i}', author=author)
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def expected(self):
+        return list(
+            Post.objects.filter(author__in=self.authors[:2]).order_by(
+                '-pub_date', '-id'
+            )
+        )
+
+    def test_merge_matches_orm(self):
+        """Слияние списков авторов совпадает с запросом ORM"""
+        first = self.client.get(URL_FOLLOW_INDEX).context['page_obj']
+        second = self.client.get(
+            URL_FOLLOW_INDEX + f'?after={first.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), self.expected())
+        back = self.client.get(
+            URL_FOLLOW_INDEX + f'?before={second.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_new_post_pushed_to_cache(self):
+        """Новый пост попадает в закэшированный список автора"""
+        self.client.get(URL_FOLLOW_INDEX)
+        with self.assertNumQueries(0):
+            pull_feed.recent([self.authors[0].pk])
+        post = Post.objects.create(text='Свежий', author=self.authors[0])
+        response = self.client.get(URL_FOLLOW_INDEX)
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_deleted_post_leaves_feed(self):
+        """Удаленный пост пропадает из ленты"""
+        self.client.get(URL_FOLLOW_INDEX)
+        newest = self.expected()[0]
+        newest.delete()
+        response = self.client.get(URL_FOLLOW_INDEX)
+        self.assertNotIn(newest, response.context['page_obj'])
+
+    def test_pages_past_cached_tail(self):
+        """Посты старше хвоста полного списка добираются из базы"""
+        with mock.patch.object(pull_feed, 'AUTHOR_FEED_LENGTH', 3):
+            pages = [self.client.get(URL_FOLLOW_INDEX).context['page_obj']]
+            while pages[-1].next_cursor:
+                pages.append(self.client.get(
+                    URL_FOLLOW_INDEX + f'?after={pages[-1].next_cursor}'
+                ).context['page_obj'])
+            back = self.client.get(
+                URL_FOLLOW_INDEX + f'?before={pages[-1].previous_cursor}'
+            ).context['page_obj']
+            cached = cache.get(
+                pull_feed.AUTHOR_FEED_KEY.format(self.authors[0].pk)
+            )
+        self.assertEqual(len(cached), 3)
+        self.assertEqual(
+            [post for page in pages for post in page], self.expected()
+        )
+        self.assertEqual(list(back), list(pages[-2]))
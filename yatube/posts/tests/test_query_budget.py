@@ -0,0 +1,82 @@
+# Бюджеты запросов страниц с постами
+# posts/tests/test_query_budget.py
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+from posts.settings import NUMBER_OF_POSTS
+
+from .budget import QueryBudgetMixin
+
+# Сессия и пользователь, выборка страницы, миниатюры одной пачкой и
+# то, что нужно самой странице. От числа постов и комментариев
+# бюджет не зависит.
+BUDGETS = {
+    'posts:index': 4,
+    'posts:group': 5,
+    'posts:profile': 7,  # и колонка «Кого почитать»
+    'posts:post_detail': 5,
+    'posts:post_comments': 4,
+    'posts:follow_index': 6,
+    'posts:search': 4,
+}
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def add_posts(self, count, comments):
+        for i in range(count):
+            post = Post.objects.create(
+                text='Пост',
+                author=self.author,
+                group=self.group,
+                image=f'posts/{i}.gif' if i % 2 else '',
+            )
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.reader, text='Комментарий')
+                for _ in range(comments)
+            )
+        return post
+
+    def urls(self, post):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group': reverse('posts:group', args=[self.group.slug]),
+            'posts:profile': reverse(
+                'posts:profile', args=[self.author.username]
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[post.id]
+            ),
+            'posts:post_comments': reverse(
+                'posts:post_comments', args=[post.id]
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:search': reverse('posts:search') + '?q=Пост',
+        }
+
+    def test_pages_fit_budget(self):
+        """Страницы укладываются в бюджет на любом числе постов"""
+        for count, comments in ((1, 1), (NUMBER_OF_POSTS * 2, 20)):
+            post = self.add_posts(count, comments)
+            for name, url in self.urls(post).items():
+                for client in (Client(), self.client):
+                    with self.subTest(count=count, url=url):
+                        cache.clear()
+                        with self.assertQueryBudget(BUDGETS[name]):
+                            client.get(url)
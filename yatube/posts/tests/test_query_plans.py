@@ -0,0 +1,95 @@
+# Тесты планов запросов горячих страниц
+# posts/tests/test_query_plans.py
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+from posts.settings import NUMBER_OF_POSTS
+
+from .plans import QueryPlanMixin, plan_problems
+
+
+class PlanProblemsTest(TestCase):
+    def test_problems(self):
+        """Полный проход и временная сортировка находятся"""
+        self.assertEqual(plan_problems([
+            'SCAN posts_post USING INDEX post_date_idx',
+            'SEARCH posts_comment USING INDEX comment_post_created_idx '
+            '(post_id=?)',
+            'SCAN posts_post_fts VIRTUAL TABLE INDEX 0:M1',
+        ]), [])
+        self.assertEqual(len(plan_problems([
+            'SCAN posts_post',
+            'SCAN TABLE posts_comment',
+            'SEARCH posts_post USING INDEX posts_post_author_id '
+            '(author_id=?)',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ])), 3)
+
+
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for _ in range(NUMBER_OF_POSTS * 2):
+            cls.post = Post.objects.create(
+                text='Пост', author=cls.author, group=cls.group
+            )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text='Комментарий')
+            for _ in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def pages(self):
+        """Первая и следующая страницы горячих представлений.
+
+        Следующая страница комментариев поста — отдельный фрагмент.
+        """
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        comments = reverse('posts:post_comments', args=[self.post.id])
+        urls = (
+            ('index', reverse('posts:index'), 'page_obj', None),
+            ('group_posts', reverse('posts:group', args=[self.group.slug]),
+             'page_obj', None),
+            ('profile', reverse('posts:profile', args=[self.author.username]),
+             'page_obj', None),
+            ('follow_index', reverse('posts:follow_index'), 'page_obj', None),
+            ('post_detail', detail, 'comments', comments),
+        )
+        for name, url, key, next_url in urls:
+            yield name, url
+            cursor = self.client.get(url).context[key].next_cursor
+            if cursor:
+                yield (
+                    f'{name}, после курсора',
+                    f'{next_url or url}?after={cursor}',
+                )
+
+    def assertPagesUseIndexes(self):
+        for label, url in list(self.pages()):
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertQueryPlans(label):
+                    self.client.get(url)
+
+    def test_pages_use_indexes(self):
+        """Горячие страницы читают посты и комментарии по индексам"""
+        self.assertPagesUseIndexes()
+
+    @override_settings(POSTS_FOLLOW_FEED='timeline')
+    def test_timeline_uses_indexes(self):
+        """Лента подписок из таблицы ленты тоже"""
+        self.assertPagesUseIndexes()
@@ -0,0 +1,85 @@
+# Тесты полнотекстового поиска
+# posts/tests/test_search.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Post, User
+from posts.settings import NUMBER_OF_POSTS
+
+URL_SEARCH = reverse('posts:search')
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(
+            text='Котики <b>правят</b> интернетом', author=cls.user
+        )
+        Post.objects.create(text='Про собак', author=cls.user)
+
+    def search(self, query, **params):
+        return self.client.get(URL_SEARCH, {'q': query, **params})
+
+    def test_search_with_highlight(self):
+        """Поиск по префиксу слова с экранированной подсветкой"""
+        response = self.search('кот')
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        self.assertContains(response, '<mark>Котики</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_index_follows_updates(self):
+        """Индекс следует за изменением и удалением постов"""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Хомяки'
+        post.save()
+        self.assertFalse(self.search('котики').context['page_obj'])
+        self.assertTrue(self.search('хомяки').context['page_obj'])
+        post.delete()
+        self.assertFalse(self.search('хомяки').context['page_obj'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Операторы FTS5 во вводе не ломают поиск"""
+        response = self.search('"кот* OR NEAR(')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cursor_pagination(self):
+        """Страницы результатов по курсору, запрос сохраняется"""
+        Post.objects.bulk_create(
+            Post(text=f'Поиск номер {i}', author=self.user)
+            for i in range(NUMBER_OF_POSTS + 2)
+        )
+        first = self.search('поиск')
+        page_obj = first.context['page_obj']
+        self.assertEqual(len(page_obj), NUMBER_OF_POSTS)
+        self.assertContains(
+            first, '?q=%D0%BF%D0%BE%D0%B8%D1%81%D0%BA&amp;after='
+        )
+        second = self.search('поиск', after=page_obj.next_cursor)
+        ids = {post.pk for post in page_obj}
+        ids |= {post.pk for post in second.context['page_obj']}
+        self.assertEqual(len(ids), NUMBER_OF_POSTS + 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет через индекс"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post]
+        )
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс порциями"""
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=1, stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(
+            list(self.search('котики').context['page_obj']), [self.post]
+        )
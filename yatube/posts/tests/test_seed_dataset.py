@@ -0,0 +1,64 @@
+# Тесты генератора данных для нагрузочных тестов
+# posts/tests/test_seed_dataset.py
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from posts.models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SIZES = {
+    'users': 30, 'groups': 3, 'posts': 300, 'comments': 200,
+    'follows': 50, 'images': 2,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedDatasetTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, seed=1):
+        call_command('seed_dataset', seed=seed, stdout=StringIO(), **SIZES)
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pub_date').values_list(
+            'author__username', 'group__slug', 'image', 'text', 'pub_date'
+        ))
+
+    def test_counts(self):
+        """Создается заказанное число строк, счетчики сверены"""
+        self.seed()
+        self.assertEqual(User.objects.count(), SIZES['users'])
+        self.assertEqual(Group.objects.count(), SIZES['groups'])
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), SIZES['comments'])
+        self.assertLessEqual(Follow.objects.count(), SIZES['follows'])
+        post = Comment.objects.select_related('post').first().post
+        self.assertEqual(post.comments_count, post.comments.count())
+        for comment in Comment.objects.select_related('post'):
+            self.assertGreater(comment.created, comment.post.pub_date)
+
+    def test_power_law(self):
+        """Самый плодовитый автор пишет много больше медианного"""
+        self.seed()
+        counts = sorted(Counter(
+            Post.objects.values_list('author_id', flat=True)
+        ).values(), reverse=True)
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+
+    def test_reproducible(self):
+        """Тот же seed дает те же данные, другой — другие"""
+        self.seed()
+        first = self.snapshot()
+        for seed, same in ((1, True), (2, False)):
+            User.objects.all().delete()
+            Group.objects.all().delete()
+            self.seed(seed)
+            self.assertEqual(self.snapshot() == first, same)
@@ -0,0 +1,134 @@
+# Тесты рекомендаций «Кого почитать»
+# posts/tests/test_suggest_follows.py
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.management.commands import suggest_follows
+from posts.models import Follow, FollowSuggestion, User, UserStats
+
+
+class SuggestFollowsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = ('Reader', 'Twin', 'A', 'B', 'X', 'Y', 'Z')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        # x читают оба автора читателя, y — один; z читает похожий
+        # читатель, который подписан на тех же, что и Reader
+        for user, author in (
+            ('Reader', 'A'), ('Reader', 'B'),
+            ('Twin', 'A'), ('Twin', 'B'), ('Twin', 'Z'),
+            ('A', 'X'), ('A', 'Y'), ('B', 'X'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def suggest(self, **options):
+        call_command('suggest_follows', stdout=StringIO(), **options)
+
+    def suggested(self, name):
+        return list(FollowSuggestion.objects.filter(
+            user=self.users[name]
+        ).values_list('author__username', flat=True))
+
+    def test_ranking(self):
+        """Друзья друзей по числу связей, затем подписки похожих"""
+        self.suggest()
+        self.assertEqual(self.suggested('Reader'), ['X', 'Y', 'Z'])
+        for name in ('Reader', 'Twin', 'A'):
+            with self.subTest(name=name):
+                user = self.users[name]
+                followed = set(Follow.objects.filter(
+                    user=user
+                ).values_list('author__username', flat=True))
+                self.assertFalse(followed & set(self.suggested(name)))
+                self.assertNotIn(name, self.suggested(name))
+
+    def test_blocks_do_not_change_result(self):
+        """Крошечный --max-nnz режет расчет на блоки без потерь"""
+        self.suggest()
+        whole = list(FollowSuggestion.objects.values_list(
+            'user_id', 'author_id', 'rank'
+        ))
+        self.suggest(max_nnz=1)
+        self.assertEqual(
+            list(FollowSuggestion.objects.values_list(
+                'user_id', 'author_id', 'rank'
+            )),
+            whole,
+        )
+
+    def test_stale_only(self):
+        """--stale пересчитывает только тех, чьи подписки менялись"""
+        self.suggest()
+        Follow.objects.create(
+            user=self.users['Reader'], author=self.users['X']
+        )
+        FollowSuggestion.objects.filter(user=self.users['Twin']).delete()
+        self.suggest(stale=True)
+        self.assertEqual(self.suggested('Reader'), ['Y', 'Z'])
+        self.assertEqual(self.suggested('Twin'), [])
+        self.assertFalse(self.stale())
+
+    def stale(self):
+        return set(UserStats.objects.filter(
+            suggestions_stale=True
+        ).values_list('user__username', flat=True))
+
+    def test_failed_run_keeps_flags(self):
+        """Оборвавшийся расчет не снимает флаги: --stale досчитает"""
+        flagged = self.stale()
+        self.assertTrue(flagged)
+        with mock.patch.object(
+            suggest_follows.Scorer, 'score', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.suggest(stale=True)
+        self.assertEqual(self.stale(), flagged)
+        self.suggest(stale=True)
+        self.assertFalse(self.stale())
+
+    def test_follow_during_run_keeps_flag(self):
+        """Подписка после чтения ребер оставляет флаг для следующего раза"""
+        read_edges = suggest_follows.edges
+
+        def edges_then_follow():
+            edges = read_edges()
+            Follow.objects.create(
+                user=self.users['Reader'], author=self.users['Y']
+            )
+            return edges
+
+        with mock.patch.object(suggest_follows, 'edges', edges_then_follow):
+            self.suggest()
+        self.assertEqual(self.stale(), {'Reader'})
+        self.assertIn('Y', self.suggested('Reader'))
+        self.suggest(stale=True)
+        self.assertNotIn('Y', self.suggested('Reader'))
+        self.assertFalse(self.stale())
+
+    def test_profile_sidebar(self):
+        """Профиль показывает рекомендации без тех, на кого уже подписан"""
+        self.suggest()
+        client = Client()
+        client.force_login(self.users['Reader'])
+        url = reverse('posts:profile', args=['A'])
+        x_url = reverse('posts:profile', args=['X'])
+        response = client.get(url)
+        self.assertEqual(
+            [author.username for author in response.context['suggestions']],
+            ['X', 'Y', 'Z'],
+        )
+        self.assertContains(response, x_url)
+        client.get(reverse('posts:profile_follow', args=['X']))
+        response = client.get(url)
+        self.assertNotContains(response, x_url)
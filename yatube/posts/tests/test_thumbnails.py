@@ -0,0 +1,121 @@
+# Тесты фоновой генерации миниатюр
+# posts/tests/test_thumbnails.py
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Post, User
+from sorl.thumbnail import get_thumbnail
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        cache.clear()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def test_request_does_not_generate(self):
+        """Пока миниатюры нет, страницы показывают заглушку"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertNotContains(response, '/cache/')
+                self.assertContains(response, 'bg-light')
+
+    def test_generated_thumbnail_on_pages(self):
+        """После генерации миниатюра видна и в закэшированных страницах"""
+        url = reverse('posts:index')
+        Client().get(url)
+        thumbnails.generate(self.post.id)
+        response = Client().get(url)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, 'class="card-img my-2" src="')
+
+    def test_missing_image_keeps_placeholder(self):
+        """Пропавший файл не роняет генерацию, остается заглушка"""
+        Post.objects.filter(pk=self.post.pk).update(image='posts/none.jpg')
+        with self.assertLogs('sorl.thumbnail', 'ERROR'):
+            thumbnails.generate(self.post.id)
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, 'height: 339px')
+
+    def test_prime_reads_page_in_one_batch(self):
+        """Миниатюры страницы читаются из KV одной пачкой"""
+        posts = [self.post] + [
+            Post.objects.create(
+                text='Еще пост', author=self.author,
+                image=SimpleUploadedFile(
+                    name=f'small{i}.gif', content=SMALL_GIF,
+                    content_type='image/gif',
+                ),
+            )
+            for i in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.id)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prime(posts, '100x100', crop='center')
+            found = [
+                get_thumbnail(post.image, '100x100', crop='center')
+                for post in posts
+            ]
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(all(found))
+
+    def test_scheduled_only_for_new_image(self):
+        """Правка текста не ставит миниатюры в очередь, новая картинка — да"""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.post.text = 'Новый текст'
+            self.post.save()
+            schedule.assert_not_called()
+            self.post.image = SimpleUploadedFile(
+                name='other.gif', content=SMALL_GIF + b'\x00',
+                content_type='image/gif',
+            )
+            self.post.save()
+            schedule.assert_called_once_with(self.post)
@@ -0,0 +1,81 @@
+# Тесты ленты подписок
+# posts/tests/test_timeline.py
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, User
+
+URL_FOLLOW_INDEX = reverse('posts:follow_index')
+
+
+@override_settings(POSTS_FOLLOW_FEED='timeline')
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_backfills_timeline(self):
+        """Подписка подтягивает старые посты автора"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(URL_FOLLOW_INDEX)
+        self.assertEqual(list(response.context['page_obj']), [self.old_post])
+
+    def test_fan_out_new_post(self):
+        """Новый пост раскладывается по лентам подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        timeline.fan_out(new_post.pk)
+        response = self.client.get(URL_FOLLOW_INDEX)
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.old_post]
+        )
+
+    def test_unfollow_drops_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertFalse(self.reader.timeline.exists())
+
+    def test_timeline_is_capped(self):
+        """Длина ленты ограничена TIMELINE_LENGTH"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        with mock.patch.object(timeline, 'TIMELINE_LENGTH', 1):
+            timeline.fan_out(new_post.pk)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('post', flat=True)),
+            [new_post.pk]
+        )
+
+    def test_fan_out_queries_per_chunk(self):
+        """Раскладка делает INSERT и DELETE на пачку, а не на подписчика"""
+        followers = [
+            User.objects.create_user(username=f'Follower{i}')
+            for i in range(5)
+        ]
+        for user in followers:
+            Follow.objects.create(user=user, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        with mock.patch.object(timeline, 'TIMELINE_LENGTH', 1):
+            with mock.patch.object(timeline, 'FAN_OUT_CHUNK', 2):
+                # пост, подписчики и по две на каждую из трех пачек
+                with self.assertNumQueries(8):
+                    timeline.fan_out(new_post.pk)
+        for user in followers:
+            self.assertEqual(
+                list(user.timeline.values_list('post', flat=True)),
+                [new_post.pk],
+            )
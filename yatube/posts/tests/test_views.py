@@ -136,9 +136,33 @@ class PostsPagesTests(TestCase):
         cache.clear()
         response = self.autorized_author.get(URL_INDEX)
         self.assertEqual(len(response.context['page_obj']), NUMBER_OF_POSTS)
+        next_cursor = response.context['page_obj'].next_cursor
         response = self.autorized_author.get(
-            URL_INDEX + '?page=2')
+            URL_INDEX + f'?after={next_cursor}')
         self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_cursor_back_to_first_page(self):
+        """Курсор before возвращает на предыдущую страницу"""
+        first = self.autorized_author.get(URL_INDEX).context['page_obj']
+        second = self.autorized_author.get(
+            URL_INDEX + f'?after={first.next_cursor}'
+        ).context['page_obj']
+        self.assertTrue(second.has_previous())
+        response = self.autorized_author.get(
+            URL_INDEX + f'?before={second.previous_cursor}'
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), list(first))
+        self.assertFalse(page_obj.has_previous())
+
+    def test_cursor_garbage_is_first_page(self):
+        """Битый курсор отдает первую страницу"""
+        response = self.autorized_author.get(URL_INDEX + '?after=%%%')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['page_obj'][0], self.post2
+        )
 
     def test_true_group_posts(self):
         """Посты по группам + пагинатор"""
@@ -146,8 +170,9 @@ class PostsPagesTests(TestCase):
         self.assertEqual(response.context.get(
             'group').title, 'Тестовый заголовок')
         self.assertEqual(len(response.context['page_obj']), NUMBER_OF_POSTS)
+        next_cursor = response.context['page_obj'].next_cursor
         response = self.autorized_author.get(
-            self.URL_POSTS_GROUP + '?page=2')
+            self.URL_POSTS_GROUP + f'?after={next_cursor}')
         self.assertEqual(len(response.context['page_obj']), 2)
 
     def test_true_user_posts(self):
@@ -157,8 +182,9 @@ class PostsPagesTests(TestCase):
             response.context.get('user_info').username, self.user.username
         )
         self.assertEqual(len(response.context['page_obj']), NUMBER_OF_POSTS)
+        next_cursor = response.context['page_obj'].next_cursor
         response = self.autorized_author.get(
-            self.URL_PROFILE + '?page=2'
+            self.URL_PROFILE + f'?after={next_cursor}'
         )
         self.assertEqual(len(response.context['page_obj']), 2)
 
@@ -0,0 +1,169 @@
+# posts/thumbnails.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import fragments
+from .middleware import PAGES
+from .models import Post
+from .settings import THUMBNAIL_GEOMETRIES, THUMBNAIL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+# записи KV, заранее прочитанные пачкой для текущей страницы
+_primed = threading.local()
+
+
+class BatchKVStore(KVStore):
+    """KV-хранилище sorl, которое умеет читать пачкой.
+
+    prime() достает записи для целой страницы одним get_many и одним
+    запросом к базе на промахи кэша. Следующие get() по этим ключам
+    берут значения из памяти потока, каждое один раз.
+    """
+
+    def _get_raw(self, key):
+        values = getattr(_primed, 'values', {})
+        if key in values:
+            value = values.pop(key)
+            return None if value == EMPTY_VALUE else value
+        return super()._get_raw(key)
+
+    def get_many_raw(self, keys):
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            rows = dict(
+                KVStoreModel.objects.filter(key__in=missing).values_list(
+                    'key', 'value'
+                )
+            )
+            loaded = {key: rows.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(loaded, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(loaded)
+        return found
+
+    def prime(self, image_files):
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        _primed.values = self.get_many_raw(keys)
+
+
+def forget_primed(**kwargs):
+    _primed.values = {}
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который в запросе только ищет готовую миниатюру.
+
+    Тег {% thumbnail %} получает None, пока миниатюра не готова, и
+    рисует ветку {% empty %} с заглушкой. Миниатюры делает generate()
+    в пуле потоков сразу после загрузки картинки.
+    """
+
+    def _thumbnail_file(self, file_, geometry_string, options):
+        # те же шаги, что в ThumbnailBackend.get_thumbnail до поиска в KV
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self._thumbnail_file(file_, geometry_string, options)
+        return default.kvstore.get(thumbnail)
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def prime(posts, geometry_string, **options):
+    """Миниатюры картинок постов страницы одним обращением к KV.
+
+    Геометрия и опции должны совпадать с тегом {% thumbnail %},
+    иначе ключи не сойдутся и тег прочитает KV сам.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, BatchKVStore):
+        return
+    backend = default.backend
+    kvstore.prime([
+        backend._thumbnail_file(post.image, geometry_string, dict(options))
+        for post in posts if post.image
+    ])
+
+
+def generate(post_id):
+    """Все миниатюры, которые показывают шаблоны, для картинки поста.
+
+    После генерации сбрасываются кэши страниц с постом, иначе там
+    так и осталась бы заглушка.
+    """
+    try:
+        post = Post.objects.filter(pk=post_id).only(
+            'image', 'author_id', 'group_id'
+        ).first()
+        if post is None or not post.image:
+            return
+        for geometry, options in THUMBNAIL_GEOMETRIES:
+            default.backend.generate(post.image, geometry, **options)
+        fragments.bump(PAGES, *fragments.post_feeds(
+            post.author_id, post.group_id
+        ))
+    except Exception:
+        logger.exception('Не удалось сделать миниатюры поста %s', post_id)
+
+
+def _work(post_id):
+    # у потока пула свое соединение с базой, его надо закрыть самим
+    try:
+        generate(post_id)
+    finally:
+        connection.close()
+
+
+def workers():
+    """Потоков пула; 0 — миниатюры делаются прямо в submit().
+
+    Задается настройкой POSTS_THUMBNAIL_WORKERS. Тестам нужен 0: поток
+    пула писал бы в медиа и базу, пока тест их уже убирает.
+    """
+    return getattr(settings, 'POSTS_THUMBNAIL_WORKERS', THUMBNAIL_WORKERS)
+
+
+def submit(post_id):
+    global _pool
+    if not workers():
+        generate(post_id)
+        return
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            workers(), thread_name_prefix='thumbnails'
+        )
+    _pool.submit(_work, post_id)
+
+
+def schedule(post):
+    """Миниатюры делаются после коммита, когда файл уже сохранен."""
+    if post.image:
+        post_id = post.pk
+        transaction.on_commit(lambda: submit(post_id))
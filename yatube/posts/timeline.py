@@ -0,0 +1,99 @@
+# posts/timeline.py
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Follow, Post, TimelineEntry
+from .settings import FOLLOW_FEED, TIMELINE_LENGTH
+
+# подписчиков в одной пачке раскладки: строк в INSERT и id в IN (...)
+FAN_OUT_CHUNK = 500
+
+
+def enabled():
+    """Лента подписок строится раскладкой при записи.
+
+    Движок выбирается настройкой POSTS_FOLLOW_FEED: 'timeline'
+    или 'pull' (сборка при чтении, см. posts.pull_feed).
+    """
+    return getattr(settings, 'POSTS_FOLLOW_FEED', FOLLOW_FEED) == 'timeline'
+
+
+def trim(user_ids):
+    """Оставляет в лентах читателей только TIMELINE_LENGTH свежих записей.
+
+    Один DELETE на всех: место записи в ленте считает оконная функция,
+    вложенный запрос выбирает строки дальше TIMELINE_LENGTH.
+    """
+    ranked = TimelineEntry.objects.filter(user_id__in=user_ids).annotate(
+        place=Window(
+            RowNumber(), partition_by=[F('user_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )
+    ).order_by().values('pk', 'place')
+    sql, params = ranked.query.sql_with_params()
+    table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM ({sql}) ranked WHERE place > %s)',
+            (*params, TIMELINE_LENGTH),
+        )
+
+
+def fan_out(post_id):
+    """Раскладывает новый пост по лентам всех подписчиков автора.
+
+    Подписчики идут пачками по FAN_OUT_CHUNK: на пачку один INSERT
+    и один DELETE лишнего, сколько бы подписчиков ни было в ней.
+    """
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    for start in range(0, len(follower_ids), FAN_OUT_CHUNK):
+        chunk = follower_ids[start:start + FAN_OUT_CHUNK]
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, post=post, pub_date=post.pub_date
+                )
+                for user_id in chunk
+            ),
+            ignore_conflicts=True,
+        )
+        trim(chunk)
+
+
+def backfill(user_id, author_id):
+    """Подписка: свежие посты автора попадают в ленту читателя."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )[:TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def drop(user_id, author_id):
+    """Отписка: посты автора уходят из ленты читателя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def schedule_fan_out(post_id):
+    """Раскладка идет после коммита, а не внутри транзакции записи поста."""
+    transaction.on_commit(lambda: fan_out(post_id))
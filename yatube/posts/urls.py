@@ -14,6 +14,11 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -26,6 +31,7 @@ urlpatterns = [
         name='profile_unfollow'
     ),
     path('create/', views.post_create, name='post_create'),
+    path('search/', views.search, name='search'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('', views.index, name='index'),
 ]
@@ -1,72 +1,126 @@
 # posts/views.py
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from posts.settings import NUMBER_OF_POSTS
+from posts.settings import COMMENTS_PER_PAGE, NUMBER_OF_POSTS
 
+from . import follow_graph, suggestions, timeline
+from .counters import user_stats
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .fragments import feed_cache
+from .models import Comment, Follow, Group, Post, User
+from .paginator import CursorPaginator, get_cursor_page
+from .pull_feed import PullPaginator
+from .search import search_page
 
 
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = get_cursor_page(request, post_list)
     context = {
         'page_obj': page_obj,
+        **feed_cache(request, 'index'),
     }
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author')
+    page_obj = get_cursor_page(request, posts)
     context = {
         'group': group,
         'posts': posts,
         'page_obj': page_obj,
+        **feed_cache(request, f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
 def profile(request, username):
-    user_info = get_object_or_404(User, username=username)
-    user_posts = Post.objects.filter(author=user_info)
-    paginator = Paginator(user_posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    user_info = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    user_posts = Post.objects.filter(author=user_info).select_related('group')
+    page_obj = get_cursor_page(request, user_posts)
     following = False
     if request.user.is_authenticated:
-        following = user_info.following.filter(user=request.user).exists()
+        following = follow_graph.is_following(
+            request.user.pk, user_info.pk
+        )
     context = {
         'user_info': user_info,  # юзверь
         'user_posts': user_posts,  # его посты
         'page_obj': page_obj,  # что пихнуть на страницу
-        'following': following
+        'following': following,
+        'stats': user_stats(user_info),
+        'suggestions': suggestions.for_user(
+            request.user, exclude=user_info.pk
+        ),
+        **feed_cache(request, f'profile:{user_info.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    selected_post = get_object_or_404(Post, id=post_id)
+    selected_post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     comments_form = CommentForm(request.POST or None)
-    user_posts = Post.objects.filter(author=selected_post.author)
-    post = user_posts.count()
+    post = user_stats(selected_post.author).posts_count
     title = selected_post.text[:30]
     context = {
         'selected_post': selected_post,  # выбранный пост
         'post': post,  # его длина
         'title': title,  # его титул
         'comments_form': comments_form,
+        'comments': comments_page(post_id),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(post_id, after=None):
+    """Порция комментариев, новые первыми, с авторами одним JOIN."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = CursorPaginator(
+        comments, COMMENTS_PER_PAGE, date_field='created'
+    )
+    return paginator.get_page(after=after)
+
+
+def post_comments(request, post_id):
+    """Фрагмент со следующей порцией комментариев для «Показать еще»."""
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, request.GET.get('after')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_page(
+        query,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
@@ -85,6 +139,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user != post.author:
@@ -95,7 +150,8 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        # только поля формы: счетчики меняются в обход экземпляра
+        form.save(commit=False).save(update_fields=PostForm.Meta.fields)
         return redirect('posts:post_detail', post_id=post.id)
     context = {
         'post': post,
@@ -106,6 +162,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -118,27 +175,37 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user).all()
-    paginator = Paginator(posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if timeline.enabled():
+        entries = request.user.timeline.select_related(
+            'post__author', 'post__group'
+        )
+        page_obj = get_cursor_page(request, entries)
+        page_obj.object_list = [entry.post for entry in page_obj]
+    else:
+        authors = follow_graph.following(request.user.pk)
+        page_obj = PullPaginator(authors, NUMBER_OF_POSTS).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
     context = {
-        'posts': posts,
+        'posts': page_obj.object_list,
         'page_obj': page_obj
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):  # подписка
     user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author and user not in author.following.all():
+    if user != author and not follow_graph.is_following(user.pk, author.pk):
         Follow.objects.get_or_create(user=user, author=author)
     return redirect('posts:profile', username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):  # отписка
     user = request.user
     author = get_object_or_404(User, username=username)
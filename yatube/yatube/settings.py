@@ -1,5 +1,7 @@
 # yatube/settings.py
+import hashlib
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -29,13 +31,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # первым: замер включает все остальные middleware
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -43,7 +50,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # обычный движок Django, который еще считает время рендера
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -54,6 +62,9 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            # extends, include, for и cache с замером времени для метрик
+            'builtins': ['core.templatetags.timing'],
+            'libraries': {'cache': 'core.templatetags.timed_cache'},
         },
     },
 ]
@@ -104,8 +115,59 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Рабочие файлы общие для воркеров одного деплоя. Путь задается
+# переменной окружения, иначе он свой у каждой копии проекта.
+DEPLOYMENT_NAME = 'yatube-{}'.format(
+    hashlib.md5(BASE_DIR.encode()).hexdigest()[:8]
+)
+
+
+def _deployment_path(variable, suffix):
+    return os.environ.get(variable) or os.path.join(
+        tempfile.gettempdir(), DEPLOYMENT_NAME + suffix
+    )
+
+
+CACHE_LOCATION = _deployment_path('YATUBE_CACHE_LOCATION', '.cache')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.mmapcache.MmapCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_SIZE': 64 * 1024 * 1024,
+            'SLOT_SIZE': 16 * 1024,
+            'WAYS': 8,
+        },
+    },
+    # Целые страницы для анонимов: в слот помещается лента с запасом
+    'pages': {
+        'BACKEND': 'core.cache.mmapcache.MmapCache',
+        'LOCATION': CACHE_LOCATION + '.pages',
+        'OPTIONS': {
+            'MAX_SIZE': 128 * 1024 * 1024,
+            'SLOT_SIZE': 128 * 1024,
+            'WAYS': 8,
+        },
+    },
 }
+# Тесты работают со своими временными кэшами и рабочими файлами
+TEST_RUNNER = 'core.test_runner.IsolatedCacheRunner'
+# Миниатюры делаются в фоне после загрузки, в запросе только ищутся
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.BatchKVStore'
+# Картинки постов именуются хэшем содержимого, одинаковые хранятся
+# одним файлом; миниатюры sorl пишутся обычным хранилищем.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Файлы счетчиков воркеров для /metrics, по одному на процесс
+METRICS_DIR = _deployment_path('YATUBE_METRICS_DIR', '.metrics')
+# Запросы дольше порога, мс, пишутся с планом в журнал (JSON по строке)
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG = _deployment_path(
+    'YATUBE_SLOW_QUERY_LOG', '.slow-queries.jsonl'
+)
+# Профили запросов: каждый N-й запрос случайно (0 — только по
+# заголовку или подписи), в кольце хранятся последние PROFILE_KEEP
+PROFILE_SAMPLE_RATE = 0
+PROFILE_KEEP = 100
+PROFILE_DIR = _deployment_path('YATUBE_PROFILE_DIR', '.profiles')
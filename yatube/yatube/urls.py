@@ -1,10 +1,18 @@
+from core.views import (
+    metrics_view, profile_file, profiles_view, serve_media,
+)
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
 urlpatterns = [
+    path('admin/profiles/', profiles_view, name='profiles'),
+    path(
+        'admin/profiles/<name>.<kind>', profile_file, name='profile_file'
+    ),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
@@ -15,6 +23,9 @@ handler500 = 'core.views.server_error'
 handler403 = 'core.views.csrf_failure'
 
 if settings.DEBUG:
+    # В бою то же делает веб-сервер: имена из 64 hex-символов
+    # неизменяемы, см. core.storage.media_cache_control.
     urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+        settings.MEDIA_URL, view=serve_media,
+        document_root=settings.MEDIA_ROOT,
     )